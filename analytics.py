@@ -0,0 +1,409 @@
+import numpy as np
+import pandas as pd
+
+import data_loader
+import registry
+
+# Tests in chronological order with their maximum score and subjects, from the test registry as it
+# was at startup. These are the defaults; the dashboard reads the registry of each data version
+TESTS = registry.load_registry(data_loader.WORKBOOK_PATH)
+TEST_MAX_SCORES = registry.test_max_scores(TESTS)
+TEST_NAMES = list(TEST_MAX_SCORES)
+
+# Subjects recorded on the test sheets, and the ones each test assesses
+SUBJECT_COLS = registry.subject_columns(TESTS)
+TEST_SUBJECTS = registry.test_subjects(TESTS)
+
+FACT_COLUMNS = ["Student ID", "Test", "Subject", "Score", "Percent"]
+
+# Minimum overall percentage for each grade, best grade first; anything lower fails
+GRADE_THRESHOLDS = {
+    "A": 90,
+    "B": 80,
+    "C": 70,
+    "D": 60
+}
+FAIL_GRADE = "F"
+
+# Averages are rounded to this many decimals before they are compared with the grade thresholds, so
+# an average of 59.99995 or more counts as 60 and gets a D. Without it an average exactly on a threshold
+# can compute just below it (a true 90 as 89.99999999999999) and its grade would depend on the backend
+GRADE_DECIMALS = 4
+
+# Width of the precomputed score histogram bins, in percentage points; grade thresholds move in these steps
+HISTOGRAM_STEP = 0.5
+
+# Percentage points gained (or lost) per test for a trend to count as improving (or declining)
+TREND_THRESHOLD = 2.0
+TREND_LABELS = ["Improving", "Steady", "Declining"]
+
+# Percentiles drawn as bands around the median on the distribution charts
+PERCENTILE_BANDS = [10, 25, 50, 75, 90]
+
+# Roster and result columns a cohort can be filtered on
+COHORT_COLUMNS = ["School", "Class", "Grade", "Trend"]
+
+
+def with_unassessed_subjects(test_name, sheet, subject_cols=SUBJECT_COLS, test_subjects=TEST_SUBJECTS):
+    """Add the subjects a test does not assess to its sheet as missing scores, so every test has every subject."""
+    assessed = test_subjects.get(test_name, subject_cols)
+    absent = [col for col in subject_cols if col not in assessed and col not in sheet.columns]
+    if not absent:
+        return sheet
+    return sheet.assign(**{col: np.nan for col in absent})
+
+
+def clean_score_sheet(sheet, subject_cols=SUBJECT_COLS):
+    """Validate a score sheet (or a chunk of one) and downcast it to compact dtypes.
+
+    Every score path goes through here, so the in-memory, streaming and sharded paths agree on what
+    counts as a score: non-numeric and negative values are missing.
+    """
+    missing = [col for col in ["Student ID"] + list(subject_cols) if col not in sheet.columns]
+    if missing:
+        raise ValueError(f"Score sheet is missing columns: {', '.join(missing)}")
+
+    # Rows without a usable Student ID cannot be attributed to anyone
+    student_ids = pd.to_numeric(sheet["Student ID"], errors="coerce")
+    keep = student_ids.notna().to_numpy()
+
+    scores = sheet.loc[keep, list(subject_cols)].apply(pd.to_numeric, errors="coerce").astype("float32")
+    scores = scores.mask(scores < 0)
+
+    cleaned = pd.DataFrame({"Student ID": pd.to_numeric(student_ids[keep].astype("int64"), downcast="integer")})
+    return pd.concat([cleaned, scores], axis=1)
+
+
+def build_score_facts(test_sheets, test_max_scores=TEST_MAX_SCORES, subject_cols=SUBJECT_COLS,
+                      test_subjects=TEST_SUBJECTS):
+    """Stack the per-test sheets into one long table of (student, test, subject) scores."""
+    frames = []
+    for test_name, max_score in test_max_scores.items():
+        sheet = test_sheets.get(test_name)
+        if sheet is None:
+            continue
+        sheet = with_unassessed_subjects(test_name, sheet, subject_cols, test_subjects)
+        sheet = clean_score_sheet(sheet, subject_cols)
+        long_df = sheet.melt(
+            id_vars="Student ID",
+            value_vars=subject_cols,
+            var_name="Subject",
+            value_name="Score"
+        )
+        long_df["Test"] = test_name
+        long_df["Percent"] = long_df["Score"] / max_score * 100
+        frames.append(long_df)
+
+    if frames:
+        facts = pd.concat(frames, ignore_index=True)
+    else:
+        facts = pd.DataFrame(columns=FACT_COLUMNS)
+
+    # Compact dtypes: categoricals for the labels, 32-bit numbers for IDs and scores
+    facts["Test"] = pd.Categorical(facts["Test"], categories=list(test_max_scores), ordered=True)
+    facts["Subject"] = pd.Categorical(facts["Subject"], categories=list(subject_cols))
+    facts["Student ID"] = pd.to_numeric(facts["Student ID"], downcast="integer")
+    facts["Score"] = facts["Score"].astype("float32")
+    facts["Percent"] = facts["Percent"].astype("float32")
+    return facts[FACT_COLUMNS]
+
+
+def test_averages(facts):
+    """Class average per test, as mean raw score and mean percentage."""
+    return facts.groupby("Test", observed=False)[["Score", "Percent"]].mean()
+
+
+def test_subject_averages(facts):
+    """Mean raw score and percentage per (test, subject) cell."""
+    return facts.groupby(["Test", "Subject"], observed=False)[["Score", "Percent"]].mean()
+
+
+def student_test_percent(facts):
+    """Mean percentage per student for each test, one row per student and one column per test."""
+    return facts.groupby(["Student ID", "Test"], observed=False)["Percent"].mean().unstack("Test")
+
+
+def student_subject_percent(facts):
+    """Mean percentage per student for each subject across all tests."""
+    return facts.groupby(["Student ID", "Subject"], observed=False)["Percent"].mean().unstack("Subject")
+
+
+def grade_order(thresholds=GRADE_THRESHOLDS):
+    return list(thresholds) + [FAIL_GRADE]
+
+
+def assign_grades(scores, thresholds=GRADE_THRESHOLDS):
+    """Bin percentages into grades in one vectorized pass; missing scores get no grade."""
+    scores = pd.Series(scores, dtype="float64")
+    grades = grade_order(thresholds)
+
+    # Bounds ascending, so searchsorted counts how many thresholds each score clears. Averages are
+    # rounded to GRADE_DECIMALS first, so one a hair below a threshold is graded as reaching it
+    bounds = np.array(list(thresholds.values())[::-1], dtype="float64")
+    cleared = np.searchsorted(bounds, np.round(scores.to_numpy(), GRADE_DECIMALS), side="right")
+    codes = len(bounds) - cleared
+    codes[scores.isna().to_numpy()] = -1
+    return pd.Series(
+        pd.Categorical.from_codes(codes, categories=grades, ordered=True),
+        index=scores.index,
+        name="Grade"
+    )
+
+
+def student_overall(student_test_pct, student_info, thresholds=GRADE_THRESHOLDS):
+    """Per-test and overall percentages with a grade for every student on the roster, indexed by Student ID.
+
+    The overall average only covers the tests a student actually has scores for.
+    """
+    overall = student_info[["Student ID", "Name"]].drop_duplicates("Student ID").set_index("Student ID")
+    test_pct = student_test_pct.rename(columns=lambda test_name: f"{test_name} Average (%)")
+    test_pct.columns = list(test_pct.columns)
+    overall = overall.join(test_pct, how="left")
+
+    # Row-wise reductions straight on the NumPy block; pandas axis=1 reductions are much slower
+    values = overall[list(test_pct.columns)].to_numpy(dtype="float64")
+    taken = np.count_nonzero(~np.isnan(values), axis=1)
+    totals = np.nansum(values, axis=1)
+    overall["Tests Taken"] = taken
+    overall["Overall Average (%)"] = np.divide(totals, taken, out=np.full(len(taken), np.nan), where=taken > 0)
+    overall["Grade"] = assign_grades(overall["Overall Average (%)"], thresholds)
+    return overall
+
+
+def grade_counts(grades):
+    """Number of students per grade, best grade first and including empty grades."""
+    return grades.value_counts(sort=False)
+
+
+def score_histograms(aggregates, step=HISTOGRAM_STEP):
+    """Students per fine percentage bin for the overall average, every test and every subject.
+
+    One column per measure, one row per bin (indexed by its lower edge). Averages are rounded as in
+    assign_grades before binning, so counts above a threshold on a bin edge match the assigned grades.
+    """
+    measures = pd.concat([
+        aggregates["student_overall"][["Overall Average (%)"]].rename(columns={"Overall Average (%)": "Overall"}),
+        aggregates["student_test_pct"].rename(columns=str),
+        aggregates["student_subject_pct"].rename(columns=str)
+    ], axis=1).reindex(aggregates["student_overall"].index)
+    values = np.round(measures.to_numpy(dtype="float64"), GRADE_DECIMALS)
+
+    # The last bin holds exactly 100%, so a threshold of 100 is answered exactly too
+    n_bins = int(round(100 / step)) + 1
+    bins = np.floor(np.clip(values, 0, 100) / step)
+
+    # One bincount over all measures: each column's bins are offset into their own range
+    present = ~np.isnan(bins)
+    offsets = np.broadcast_to(np.arange(values.shape[1]) * n_bins, bins.shape)
+    flat = (bins[present] + offsets[present]).astype("int64")
+    counts = np.bincount(flat, minlength=n_bins * values.shape[1]).reshape(values.shape[1], n_bins).T
+    return pd.DataFrame(counts, index=pd.Index(np.arange(n_bins) * step, name="Bin (%)"), columns=list(measures.columns))
+
+
+def histogram_grade_counts(histogram, thresholds=GRADE_THRESHOLDS, step=HISTOGRAM_STEP):
+    """Students per grade for any (descending) thresholds, from one histogram column by cumulative sums alone."""
+    counts = np.asarray(histogram, dtype="int64")
+    # Students in each bin or any higher one
+    at_or_above = np.append(np.cumsum(counts[::-1])[::-1], 0)
+    edges = np.round(np.array(list(thresholds.values()), dtype="float64") / step).astype("int64")
+    cleared = at_or_above[np.clip(edges, 0, len(counts))]
+    per_grade = np.diff(np.concatenate([[0], cleared, [at_or_above[0]]]))
+    return pd.Series(per_grade, index=pd.Index(grade_order(thresholds), name="Grade"), name="count")
+
+
+def assemble_aggregates(test, test_subject, student_test, student_subject, student_info):
+    """Derive the remaining dashboard aggregates from the base (test, subject and student) means."""
+    overall = student_overall(student_test, student_info)
+    return {
+        "test": test,
+        "test_subject": test_subject,
+        "subject_test_pct": test_subject["Percent"].unstack("Test"),
+        "student_test_pct": student_test,
+        "student_subject_pct": student_subject,
+        "student_overall": overall,
+        "grade_counts": grade_counts(overall["Grade"]),
+    }
+
+
+def build_aggregates(facts, student_info):
+    """Compute every aggregate the dashboard pages read, in one pass over the fact table."""
+    return assemble_aggregates(
+        test_averages(facts),
+        test_subject_averages(facts),
+        student_test_percent(facts),
+        student_subject_percent(facts),
+        student_info
+    )
+
+
+def trend_stats(values):
+    """Least-squares slope and volatility along the last axis (tests in order) of a percentage array.
+
+    Every row is fitted at once: missing tests are masked out of the sums instead of looping per row.
+    The slope is in percentage points per test and is NaN with fewer than two tests; volatility is the
+    root mean square of the residuals around the fitted line.
+    """
+    values = np.asarray(values, dtype="float64")
+    positions = np.arange(values.shape[-1], dtype="float64")
+    taken = ~np.isnan(values)
+    n = taken.sum(axis=-1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_x = np.where(taken, positions, 0).sum(axis=-1) / n
+        mean_y = np.nansum(values, axis=-1) / n
+        dx = np.where(taken, positions - mean_x[..., None], 0)
+        dy = np.where(taken, values - mean_y[..., None], 0)
+        var_x = (dx * dx).sum(axis=-1)
+        slope = np.where(n >= 2, (dx * dy).sum(axis=-1) / var_x, np.nan)
+        residuals = dy - slope[..., None] * dx
+        volatility = np.where(n >= 2, np.sqrt((residuals * residuals).sum(axis=-1) / n), np.nan)
+    return slope, volatility, n
+
+
+def trend_labels(slopes, threshold=TREND_THRESHOLD):
+    """Improving / Steady / Declining per slope; no label without a slope."""
+    slopes = np.asarray(slopes, dtype="float64")
+    codes = np.where(slopes >= threshold, 0, np.where(slopes <= -threshold, 2, 1))
+    codes[np.isnan(slopes)] = -1
+    return pd.Categorical.from_codes(codes, categories=TREND_LABELS)
+
+
+def trend_summary(test_pct, threshold=TREND_THRESHOLD):
+    """Slope, volatility and trend label for every row of a (rows x tests) percentage matrix."""
+    slope, volatility, taken = trend_stats(test_pct.to_numpy(dtype="float64"))
+    return pd.DataFrame({
+        "Tests Taken": taken,
+        "Slope (pts/test)": slope,
+        "Volatility": volatility,
+        "Trend": trend_labels(slope, threshold)
+    }, index=test_pct.index)
+
+
+def student_trends(aggregates, facts=None, subject=None, threshold=TREND_THRESHOLD):
+    """Trend of every student on the roster across the tests, overall or for one subject."""
+    overall = aggregates["student_overall"]
+    if subject is None:
+        test_pct = aggregates["student_test_pct"]
+    else:
+        test_pct = student_test_percent(facts[facts["Subject"] == subject])
+    test_pct = test_pct.reindex(overall.index)
+    return overall[["Name"]].join(trend_summary(test_pct, threshold))
+
+
+def correlation_matrix(student_pct):
+    """Pearson correlation between the columns (subjects or tests) of a per-student percentage matrix.
+
+    Computed on the column-normalized matrix with masked sums, so students missing a score only drop
+    out of the pairs that need it.
+    """
+    values = student_pct.to_numpy(dtype="float64")
+    present = ~np.isnan(values)
+    filled = np.where(present, values, 0)
+    weights = present.astype("float64")
+
+    # Pairwise counts, sums and sums of products over the students who have both scores
+    n = weights.T @ weights
+    sum_x = filled.T @ weights
+    sum_xx = (filled * filled).T @ weights
+    sum_xy = filled.T @ filled
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = sum_xy - sum_x * sum_x.T / n
+        var_x = sum_xx - sum_x * sum_x / n
+        corr = cov / np.sqrt(var_x * var_x.T)
+    corr[n < 2] = np.nan
+    columns = list(student_pct.columns)
+    return pd.DataFrame(np.clip(corr, -1, 1), index=columns, columns=columns)
+
+
+def percentile_bands(student_pct, percentiles=PERCENTILE_BANDS):
+    """Percentiles of each column's student percentages, one row per column."""
+    values = student_pct.to_numpy(dtype="float64")
+    with np.errstate(invalid="ignore"):
+        bands = np.nanpercentile(values, percentiles, axis=0) if len(values) else np.full(
+            (len(percentiles), values.shape[1]), np.nan
+        )
+    return pd.DataFrame(bands.T, index=list(student_pct.columns), columns=[f"P{p}" for p in percentiles])
+
+
+def cohort_frame(aggregates, student_info, trends=None):
+    """Filterable attributes of every student on the roster (school, class, grade, trend), by Student ID."""
+    frame = aggregates["student_overall"][["Grade"]]
+    roster = student_info.drop_duplicates("Student ID").set_index("Student ID")
+    frame = frame.join(roster[[col for col in ("School", "Class") if col in roster.columns]])
+    if trends is not None:
+        frame = frame.join(trends["Trend"])
+    return frame[[col for col in COHORT_COLUMNS if col in frame.columns]]
+
+
+def select_cohort(cohort_attributes, filters):
+    """Student IDs matching every (column, values) filter; an empty value list matches everyone."""
+    mask = np.ones(len(cohort_attributes), dtype=bool)
+    for column, values in filters:
+        if values:
+            mask &= cohort_attributes[column].isin(values).to_numpy()
+    return cohort_attributes.index[mask]
+
+
+def compare_cohorts(aggregates, cohort_a, cohort_b):
+    """Mean percentage per subject, per test and overall for two cohorts of Student IDs, with the gap."""
+    student_pct = pd.concat([
+        aggregates["student_subject_pct"].rename(columns=str),
+        aggregates["student_test_pct"].rename(columns=str),
+        aggregates["student_overall"][["Overall Average (%)"]].rename(columns={"Overall Average (%)": "Overall"})
+    ], axis=1)
+    means = {
+        label: student_pct.reindex(cohort).mean()
+        for label, cohort in (("Cohort A", cohort_a), ("Cohort B", cohort_b))
+    }
+    comparison = pd.DataFrame(means)
+    comparison["Difference"] = comparison["Cohort A"] - comparison["Cohort B"]
+    comparison.index.name = "Measure"
+    return comparison
+
+
+def top_k(scores, k=5, largest=True):
+    """The k best (or worst) scores, ties broken by the lower Student ID.
+
+    Uses a partial selection, so only the boundary candidates are ever sorted.
+    """
+    scores = scores.dropna()
+    values = scores.to_numpy(dtype="float64")
+    student_ids = scores.index.to_numpy()
+    keys = -values if largest else values
+
+    if 0 < k < len(keys):
+        kth_key = np.partition(keys, k - 1)[k - 1]
+        candidates = np.flatnonzero(keys <= kth_key)
+    else:
+        candidates = np.arange(len(keys))
+
+    order = np.lexsort((student_ids[candidates], keys[candidates]))[:max(k, 0)]
+    selected = candidates[order]
+    return pd.Series(values[selected], index=pd.Index(student_ids[selected], name="Student ID"), name=scores.name)
+
+
+def ranking_scores(aggregates, scope="overall", name=None):
+    """Per-student percentages to rank on: overall, for one test, or for one subject across tests.
+
+    Only students on the roster are ranked.
+    """
+    overall = aggregates["student_overall"]
+    if scope == "overall":
+        return overall["Overall Average (%)"]
+    if scope == "test":
+        return overall[f"{name} Average (%)"]
+    if scope == "subject":
+        scores = aggregates["student_subject_pct"][name]
+        return scores[scores.index.isin(overall.index)]
+    raise ValueError(f"Unknown ranking scope: {scope}")
+
+
+def rank_students(aggregates, scope="overall", name=None, k=5, largest=True):
+    """Top-k (or bottom-k with largest=False) students with their names and percentage."""
+    ranked = top_k(ranking_scores(aggregates, scope, name), k=k, largest=largest)
+    names = aggregates["student_overall"]["Name"].reindex(ranked.index)
+    return pd.DataFrame({
+        "Student ID": ranked.index,
+        "Name": names.to_numpy(),
+        "Score (%)": ranked.to_numpy()
+    })
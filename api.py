@@ -0,0 +1,233 @@
+"""Dashboard analytics without the Streamlit UI: a cached function API and a small local HTTP/JSON server.
+
+    python -m api [--host 127.0.0.1] [--port 8765] [--workbook StudentData.xlsx]
+
+Importing this module never imports Streamlit or Plotly, so scripts and services start quickly.
+"""
+import argparse
+import functools
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import analytics
+import data_loader
+import datasets
+import records
+import registry
+import storage
+
+# Data versions (and class selections) whose aggregates are kept in memory
+CACHE_ENTRIES = 8
+
+_sources = {}
+_sources_lock = threading.Lock()
+
+
+def _dataset(path):
+    # Stateful loaders are shared per data source: they remember what they already loaded
+    with _sources_lock:
+        if path not in _sources:
+            if datasets.is_sharded(path):
+                _sources[path] = datasets.ShardedDataset(path)
+            elif storage.BACKEND == 'sqlite':
+                _sources[path] = storage.SQLiteStore(storage.database_path(path))
+            else:
+                _sources[path] = None
+        return _sources[path]
+
+
+def data_version(path=data_loader.WORKBOOK_PATH):
+    """Content version of the data source; every cached result is keyed by it."""
+    source = _dataset(path)
+    if isinstance(source, datasets.ShardedDataset):
+        return source.refresh()
+    if isinstance(source, storage.SQLiteStore):
+        return source.sync(path)
+    return data_loader.pin_workbook(path)
+
+
+def select_shards(path=data_loader.WORKBOOK_PATH, schools=None, classes=None):
+    """Shard keys for the given schools and classes, or None for a single workbook."""
+    source = _dataset(path)
+    if not isinstance(source, datasets.ShardedDataset):
+        return None
+    return source.at(source.refresh()).select(schools, classes)
+
+
+@functools.lru_cache(maxsize=CACHE_ENTRIES)
+def _tests(path, version):
+    # The test registry of ``version``: read from its pinned workbook or stored with its SQLite import
+    source = _dataset(path)
+    if isinstance(source, datasets.ShardedDataset):
+        return analytics.TESTS
+    if isinstance(source, storage.SQLiteStore):
+        return source.at(version).tests
+    return registry.load_registry(data_loader.pinned_workbook(path, version))
+
+
+@functools.lru_cache(maxsize=CACHE_ENTRIES)
+def _load(path, version, shards):
+    # Always the data of ``version``, the key it is cached under, however the source changed since
+    source = _dataset(path)
+    if isinstance(source, datasets.ShardedDataset):
+        view = source.at(version)
+        keys = view.select() if shards is None else shards
+        return view.roster(keys), view.facts(keys), view.aggregates(keys)
+    if isinstance(source, storage.SQLiteStore):
+        view = source.at(version)
+        return view.roster(), None, view.aggregates()
+    sheets = data_loader.load_workbook(path, version=version)
+    roster = sheets[data_loader.STUDENT_INFO_SHEET]
+    tests = _tests(path, version)
+    facts = analytics.build_score_facts(sheets, registry.test_max_scores(tests), registry.subject_columns(tests),
+                                        registry.test_subjects(tests))
+    return roster, facts, analytics.build_aggregates(facts, roster)
+
+
+@functools.lru_cache(maxsize=CACHE_ENTRIES)
+def _records(path, version, shards):
+    source = _dataset(path)
+    if isinstance(source, storage.SQLiteStore):
+        return source.at(version)
+    roster, facts, _ = _load(path, version, shards)
+    tests = _tests(path, version)
+    return records.StudentRecordStore(roster, facts, registry.test_max_scores(tests), registry.subject_columns(tests))
+
+
+def aggregates(path=data_loader.WORKBOOK_PATH, shards=None):
+    """Every dashboard aggregate (see analytics.assemble_aggregates) for the current data version."""
+    return _load(path, data_version(path), shards)[2]
+
+
+def roster(path=data_loader.WORKBOOK_PATH, shards=None):
+    return _load(path, data_version(path), shards)[0]
+
+
+def class_performance(path=data_loader.WORKBOOK_PATH, shards=None):
+    """Class average per test as raw score and percentage, with the test's maximum score."""
+    version = data_version(path)
+    test = _load(path, version, shards)[2]["test"]
+    max_scores = registry.test_max_scores(_tests(path, version))
+    return test.assign(**{"Max Score": [max_scores[name] for name in test.index]})
+
+
+def subject_matrix(path=data_loader.WORKBOOK_PATH, shards=None):
+    """Mean percentage per subject (rows) and test (columns): the Overview heatmap."""
+    return aggregates(path, shards)["subject_test_pct"]
+
+
+def top_performers(scope="overall", name=None, k=5, largest=True, path=data_loader.WORKBOOK_PATH,
+                   shards=None):
+    """Top-k (or bottom-k) students overall, for a test or for a subject."""
+    version = data_version(path)
+    source = _dataset(path)
+    if isinstance(source, storage.SQLiteStore):
+        return source.at(version).rank_students(scope, name, k=k, largest=largest)
+    return analytics.rank_students(_load(path, version, shards)[2], scope, name, k=k, largest=largest)
+
+
+def grade_distribution(path=data_loader.WORKBOOK_PATH, shards=None):
+    """Number of students per overall grade."""
+    return aggregates(path, shards)["grade_counts"]
+
+
+def student_report(student_id, path=data_loader.WORKBOOK_PATH, shards=None):
+    """A student's roster details and report card, or None for an unknown ID."""
+    store = _records(path, data_version(path), shards)
+    details = store.get(student_id)
+    if details is None:
+        return None
+    return details, store.report_card(student_id)
+
+
+def _frame_json(frame, orient):
+    # pandas takes care of NaN -> null and NumPy scalars
+    return json.loads(frame.to_json(orient=orient))
+
+
+def _json_default(value):
+    # NumPy scalars from the roster become plain Python numbers
+    return value.item() if hasattr(value, 'item') else str(value)
+
+
+class AnalyticsHandler(BaseHTTPRequestHandler):
+    """Read-only JSON endpoints over the analytics API."""
+
+    data_path = data_loader.WORKBOOK_PATH
+
+    def _respond(self, status, payload):
+        body = json.dumps(payload, default=_json_default).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        route = url.path.rstrip('/')
+        data_path = self.data_path
+        try:
+            shards = select_shards(data_path, params.get('school'), params.get('class'))
+            if route == '/api/version':
+                payload = {'version': data_version(data_path)}
+            elif route == '/api/tests':
+                payload = _frame_json(class_performance(data_path, shards).reset_index(), 'records')
+            elif route == '/api/subjects':
+                payload = _frame_json(subject_matrix(data_path, shards), 'index')
+            elif route == '/api/grades':
+                payload = _frame_json(grade_distribution(data_path, shards), 'index')
+            elif route == '/api/top':
+                ranked = top_performers(
+                    params.get('scope', ['overall'])[0],
+                    params.get('name', [None])[0],
+                    k=int(params.get('k', ['5'])[0]),
+                    largest=params.get('order', ['desc'])[0] != 'asc',
+                    path=data_path,
+                    shards=shards
+                )
+                payload = _frame_json(ranked, 'records')
+            elif route.startswith('/api/students/'):
+                report = student_report(int(route.rsplit('/', 1)[1]), data_path, shards)
+                if report is None:
+                    return self._respond(404, {'error': 'Unknown student'})
+                details, card = report
+                payload = {
+                    'details': details,
+                    'report_card': _frame_json(card, 'index'),
+                }
+            else:
+                return self._respond(404, {'error': f"Unknown endpoint: {url.path}"})
+        except (KeyError, ValueError) as e:
+            return self._respond(400, {'error': str(e)})
+        self._respond(200, payload)
+
+
+def serve(host='127.0.0.1', port=8765, path=data_loader.WORKBOOK_PATH):
+    """Serve the JSON endpoints until interrupted."""
+    handler = type('Handler', (AnalyticsHandler,), {'data_path': path})
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"Serving student analytics on http://{host}:{port}/api/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the dashboard aggregates as JSON.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workbook', default=data_loader.WORKBOOK_PATH,
+                        help="workbook, or directory of per-class workbooks")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workbook)
+
+
+if __name__ == '__main__':
+    main()
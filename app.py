@@ -1,46 +1,394 @@
+import os
+import secrets
+import time
+import weakref
+
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objs as go
+
+import analytics
+import charts
+import data_loader
+import datasets
+import ingest
+import profiling
+import records
+import refresher
+import registry
+import reports
+import roster_table
+import search
+import shared_cache
+import storage
+
+# Roster columns the student table can be filtered on: every categorical one (School, Class and the
+# phone prefixes); those missing from a roster are simply not offered
+ROSTER_FILTER_COLUMNS = [col for col, kind in data_loader.ROSTER_SCHEMA.items() if kind == 'category']
+
+# Built Plotly figures kept across reruns and sessions
+FIGURE_CACHE_ENTRIES = 256
+
+# Report exports are written here and served from disk by Streamlit's static file handler
+# (server.enableStaticServing in .streamlit/config.toml), so the server never holds an archive in memory
+EXPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "exports")
+
+# Largest file the static handler serves; bigger exports are left to `python -m reports`
+EXPORT_MAX_BYTES = 200 * 1024 * 1024
+
+# Exports older than this are swept when the next one is built, e.g. those a crashed server never removed
+EXPORT_MAX_AGE_SECONDS = 60 * 60
+
+# With a shared cache directory configured, every server process on the host reads one
+# memory-mapped copy of the loaded frames and aggregates instead of holding its own
+loader_cache = shared_cache.shared if shared_cache.ENABLED else st.cache_data
 
 # Page configuration
 st.set_page_config(page_title="Student Performance Dashboard", layout="wide")
 
 # Load data functions
+@profiling.counted(loader_cache)
+def load_sheets(version):
+    # Every sheet is parsed in one pass per workbook version, then served from the columnar cache
+    return data_loader.load_workbook(data_loader.WORKBOOK_PATH, version=version)
+
+def workbook_file(version):
+    # The copy of the workbook pinned for this version; later saves of the workbook never change it
+    return data_loader.pinned_workbook(data_loader.WORKBOOK_PATH, version)
+
+@profiling.counted(loader_cache)
+def load_sheet(sheet_name, version):
+    # Very large workbooks are read sheet by sheet through the streaming reader
+    if ingest.should_stream(workbook_file(version)):
+        return data_loader.compact_sheet(sheet_name, ingest.read_sheet(workbook_file(version), sheet_name))
+    return load_sheets(version)[sheet_name]
+
+@st.cache_resource
+def sharded_dataset():
+    # Directory of per-class workbooks, shared by every session
+    return datasets.ShardedDataset(data_loader.WORKBOOK_PATH)
+
+def use_database():
+    # The SQL backend serves a single workbook; a directory of class workbooks keeps the sharded loader
+    return storage.BACKEND == 'sqlite' and not datasets.is_sharded(data_loader.WORKBOOK_PATH)
+
+@st.cache_resource
+def score_database():
+    # The workbook is imported into SQLite and queried; only changed sheets are re-imported
+    return storage.SQLiteStore(storage.database_path(data_loader.WORKBOOK_PATH))
+
+def source_version():
+    # Checks the data source itself: pins a copy of a changed workbook, reloads changed shards or
+    # re-imports changed sheets. Each backend keeps the data of the versions before it readable
+    if datasets.is_sharded(data_loader.WORKBOOK_PATH):
+        return sharded_dataset().refresh()
+    if use_database():
+        return score_database().sync(data_loader.WORKBOOK_PATH)
+    return data_loader.pin_workbook(data_loader.WORKBOOK_PATH)
+
+def select_shards(version):
+    # Class / school filters, only shown when the data source is a directory of class workbooks
+    if not datasets.is_sharded(data_loader.WORKBOOK_PATH):
+        return None
+    dataset = sharded_dataset().at(version)
+    st.sidebar.title("Classes")
+    schools = st.sidebar.multiselect("School", dataset.schools())
+    classes = st.sidebar.multiselect("Class", dataset.classes(schools))
+    return dataset.select(schools, classes)
+
+def build_snapshot(version):
+    # Runs on the refresher thread: the roster and aggregates of the full selection land in the
+    # caches before the version is published, so the first page view after a change is a cache hit
+    shards = sharded_dataset().at(version).select() if datasets.is_sharded(data_loader.WORKBOOK_PATH) else None
+    try:
+        load_roster(version, shards)
+        score_aggregates(version, shards)
+        for test_name in registry.test_max_scores(test_registry(version)):
+            ranked_students(version, shards, "test", test_name)
+    except ValueError:
+        # Classes that share Student IDs cannot be combined; pages report it for the selections it affects
+        pass
+
+@st.cache_resource
+def data_refresher():
+    # One refresher per server process; the first snapshot is built by the first session to arrive
+    return refresher.BackgroundRefresher(source_version, build_snapshot).start()
+
+def current_version():
+    # The newest fully built data version. Noticing changes and rebuilding happen on the refresher
+    # thread, so users keep the previous complete snapshot until the new one is ready
+    if refresher.REFRESH_SECONDS <= 0:
+        return source_version()
+    return data_refresher().snapshot().version
+
 @st.cache_data
-def load_data():
+def test_registry(version):
+    # Read from the version's own pinned workbook (or with its SQLite import), so a test added to the Tests
+    # sheet, and its new sheet, appear with the data that adds them. Directory datasets keep the startup one
+    if datasets.is_sharded(data_loader.WORKBOOK_PATH):
+        return analytics.TESTS
+    if use_database():
+        return score_database().at(version).tests
+    return registry.load_registry(workbook_file(version))
+
+def test_layout(version):
+    # Maximum score per test, subject columns and the subjects of each test, from the version's registry
+    tests = test_registry(version)
+    return registry.test_max_scores(tests), registry.subject_columns(tests), registry.test_subjects(tests)
+
+def load_version():
     try:
-        df = pd.read_excel('StudentData.xlsx', sheet_name='Student information')
+        return current_version()
+    except Exception as e:
+        st.error(f"Error loading student info data: {e}")
+        return None
+
+@profiling.counted(loader_cache)
+def load_roster(version, shards=None):
+    if shards is not None:
+        return sharded_dataset().at(version).roster(shards)
+    if use_database():
+        return score_database().at(version).roster()
+    return load_sheet(data_loader.STUDENT_INFO_SHEET, version)
+
+def load_tests(version):
+    try:
+        return test_registry(version)
+    except Exception as e:
+        st.error(f"Error loading the test registry: {e}")
+        return None
+
+def load_data(version, shards=None):
+    try:
+        df = load_roster(version, shards)
         return df
     except Exception as e:
         st.error(f"Error loading student info data: {e}")
         return None
 
-@st.cache_data
-def load_test_data(sheet_name):
+@profiling.counted(loader_cache)
+def score_facts(version, shards=None):
+    if shards is not None:
+        return sharded_dataset().at(version).facts(shards)
+    if use_database():
+        return score_database().at(version).facts()
+    if ingest.should_stream(workbook_file(version)):
+        # Folded into the compact fact table chunk by chunk; the raw score sheets are never held whole.
+        # The fact table itself still grows with the cohort: Student Details, Trends and exports need it
+        return ingest.stream_score_facts(workbook_file(version), *test_layout(version))
+    # Every registered test comes from the one parsed workbook; tests without a sheet yet are skipped
+    test_max_scores, subject_cols, subjects_by_test = test_layout(version)
+    sheets = load_sheets(version)
+    test_sheets = {name: sheets.get(name) for name in test_max_scores}
+    return analytics.build_score_facts(test_sheets, test_max_scores, subject_cols, subjects_by_test)
+
+@st.cache_resource(max_entries=data_loader.KEEP_VERSIONS)
+def incremental_aggregates(test_max_scores, subject_cols, subjects_by_test):
+    # One long-lived engine per server process and test registry, shared by every session
+    return ingest.IncrementalAggregates(test_max_scores, subject_cols, subjects_by_test)
+
+@profiling.counted(loader_cache)
+def score_aggregates(version, shards=None):
+    if shards is not None:
+        # Merged from the per-class partial aggregates of the selected shards
+        return sharded_dataset().at(version).aggregates(shards)
+    if use_database():
+        # Reduced by SQL queries over per-test rollups
+        return score_database().at(version).aggregates()
+    student_info = load_sheet(data_loader.STUDENT_INFO_SHEET, version)
+    if ingest.should_stream(workbook_file(version)):
+        # Fold the score sheets chunk by chunk instead of materialising them
+        return ingest.stream_aggregates(workbook_file(version), student_info, *test_layout(version))
+    # Only the test sheets that changed since the previous version are refolded
+    layout = test_layout(version)
+    sheets = load_sheets(version)
+    test_sheets = {name: sheets.get(name) for name in layout[0]}
+    return incremental_aggregates(*layout).update(test_sheets, student_info)
+
+def load_aggregates(version, shards=None):
     try:
-        test_df = pd.read_excel('StudentData.xlsx', sheet_name=sheet_name)
-        return test_df
+        return score_aggregates(version, shards)
     except Exception as e:
-        st.error(f"Error loading {sheet_name} data: {e}")
+        st.error(f"Error loading test data: {e}")
         return None
 
+@st.cache_resource
+def student_search_index(version, shards, _df):
+    # Built once per data version and shared by every session
+    if use_database():
+        return score_database().at(version)
+    return search.StudentSearchIndex(_df)
+
+@st.cache_resource
+def student_roster_table(version, shards, _df):
+    # Sort orders and per-value row indexes, built once per data version and shared by every session
+    return roster_table.RosterTable(_df)
+
+@st.cache_resource
+def student_record_store(version, shards, _df):
+    if use_database():
+        return score_database().at(version)
+    test_max_scores, subject_cols, _ = test_layout(version)
+    return records.StudentRecordStore(_df, score_facts(version, shards), test_max_scores, subject_cols)
+
+@profiling.counted(loader_cache)
+def ranked_students(version, shards, scope, name=None, k=5, largest=True):
+    # Top-k / bottom-k lists are cached per data version and ranking parameters
+    if use_database():
+        return score_database().at(version).rank_students(scope, name, k=k, largest=largest)
+    return analytics.rank_students(score_aggregates(version, shards), scope, name, k=k, largest=largest)
+
+@profiling.counted(loader_cache)
+def trend_table(version, shards, subject=None):
+    # Slopes for the whole cohort are fitted in one vectorized pass per data version and subject
+    facts = score_facts(version, shards) if subject is not None else None
+    return analytics.student_trends(score_aggregates(version, shards), facts, subject)
+
+@profiling.counted(loader_cache)
+def trend_ranking(version, shards, subject=None, k=10, largest=True):
+    # Most improved (largest) or most declining students by slope, among those with that trend only
+    trends = trend_table(version, shards, subject)
+    trends = trends[trends["Trend"] == ("Improving" if largest else "Declining")]
+    ranked = analytics.top_k(trends["Slope (pts/test)"], k=k, largest=largest)
+    return trends.loc[ranked.index].reset_index()
+
+@profiling.counted(loader_cache)
+def score_histograms(version, shards):
+    # Fine-grained histograms per measure; any what-if grading is answered from these counts
+    return analytics.score_histograms(score_aggregates(version, shards))
+
+def threshold_sliders():
+    # What-if grade cutoffs, starting from the school's thresholds
+    slider_cols = st.columns(len(analytics.GRADE_THRESHOLDS))
+    thresholds = {}
+    for slider_col, (grade, default) in zip(slider_cols, analytics.GRADE_THRESHOLDS.items()):
+        with slider_col:
+            thresholds[grade] = st.slider(f"Minimum for {grade} (%)", min_value=0.0, max_value=100.0,
+                                          value=float(default), step=analytics.HISTOGRAM_STEP, key=f"threshold_{grade}")
+    return thresholds
+
+@profiling.counted(loader_cache)
+def score_distributions(version, shards):
+    # Correlations and percentile bands of the selected classes, computed once per data version
+    aggregates = score_aggregates(version, shards)
+    return {
+        "subject_corr": analytics.correlation_matrix(aggregates["student_subject_pct"]),
+        "test_corr": analytics.correlation_matrix(aggregates["student_test_pct"].rename(columns=str)),
+        "subject_bands": analytics.percentile_bands(aggregates["student_subject_pct"]),
+        "test_bands": analytics.percentile_bands(aggregates["student_test_pct"].rename(columns=str)),
+    }
+
+@profiling.counted(loader_cache)
+def cohort_attributes(version, shards):
+    return analytics.cohort_frame(score_aggregates(version, shards), load_roster(version, shards),
+                                  trend_table(version, shards))
+
+@profiling.counted(loader_cache)
+def cohort_comparison(version, shards, filters_a, filters_b):
+    # Cached per pair of filter selections, so moving other widgets never recomputes it
+    attributes = cohort_attributes(version, shards)
+    cohort_a = analytics.select_cohort(attributes, filters_a)
+    cohort_b = analytics.select_cohort(attributes, filters_b)
+    return {
+        "comparison": analytics.compare_cohorts(score_aggregates(version, shards), cohort_a, cohort_b),
+        "sizes": pd.Series({"Cohort A": len(cohort_a), "Cohort B": len(cohort_b)}, name="Students"),
+    }
+
+def cohort_filters(label, attributes):
+    # One multiselect per attribute; the selection is returned hashable so it can key the cache.
+    # Options are the categories themselves (shown as text), so a numeric Class of 7 still matches 7
+    st.write(f"**{label}**")
+    filters = []
+    for column in attributes.columns:
+        options = attributes[column].cat.categories.tolist()
+        values = st.multiselect(column, options, format_func=str, key=f"{label}_{column}", placeholder="All")
+        filters.append((column, tuple(values)))
+    return tuple(filters)
+
+@profiling.counted(st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES))
+def cached_figure(key, _build):
+    # Figures are only rebuilt when the data version or chart parameters in the key change
+    return _build()
+
+def show_figure(key, build):
+    # Each chart is timed from cache lookup (or build) to hand-off to the browser
+    with profiling.stage("Chart: " + " ".join(str(part) for part in key[2:])):
+        st.plotly_chart(cached_figure(key, build), use_container_width=True)
+
+class ReportExport:
+    # A built archive and the data version it was built from. Its file is removed when it is replaced, when
+    # the session holding it ends (and its state is garbage collected) or when the server exits
+    def __init__(self, key, path):
+        self.key = key
+        self.path = path
+        self.remove = weakref.finalize(self, remove_export, path)
+
+def remove_export(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+def sweep_exports():
+    cutoff = time.time() - EXPORT_MAX_AGE_SECONDS
+    for entry in os.scandir(EXPORT_DIR):
+        if entry.is_file() and entry.stat().st_mtime < cutoff:
+            remove_export(entry.path)
+
+def export_report_cards(version, shards, df, progress):
+    # Reports are rendered by worker processes straight into a zip on disk, batch by batch
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    sweep_exports()
+    # Anyone with the link can download the file, so its name must not be guessable
+    export = ReportExport((version, shards), os.path.join(EXPORT_DIR, f"report-cards-{secrets.token_urlsafe(16)}.zip"))
+    test_max_scores, subject_cols, _ = test_layout(version)
+    reports.write_reports(export.path, df, score_facts(version, shards), score_aggregates(version, shards),
+                          max_workers=datasets.MAX_WORKERS, progress=progress,
+                          test_max_scores=test_max_scores, subject_cols=subject_cols)
+    return export
+
+def roster_columns(df):
+    # The roster as entered, without the columns derived at load time
+    derived = set(data_loader.PHONE_PREFIX_COLUMNS.values())
+    return [col for col in df.columns if col not in derived]
+
+def subject_label(subject):
+    # "English Score" -> "English Score", "Hindi" -> "Hindi Score"
+    return subject if subject.endswith("Score") else f"{subject} Score"
+
+def profiling_panel(summary):
+    # Admin-only view of the run that just finished
+    with st.sidebar.expander("Profiling (last run)"):
+        st.write(f"**Total:** {summary['total_ms']:.0f} ms")
+        if summary["peak_memory_mb"] is not None:
+            st.write(f"**Peak memory:** {summary['peak_memory_mb']:.0f} MB")
+        st.dataframe(
+            pd.DataFrame(summary["stages"], columns=["stage", "ms"]).rename(columns={"stage": "Stage", "ms": "Time (ms)"}),
+            hide_index=True,
+            use_container_width=True
+        )
+        cache = pd.DataFrame.from_dict(summary["cache"], orient="index", columns=["hits", "misses"])
+        st.dataframe(cache.rename(columns={"hits": "Hits", "misses": "Misses"}), use_container_width=True)
+
 # Main application
-def main():
+def dashboard():
     st.title("🎓 Student Performance Dashboard")
     
     # Load data
-    df = load_data()
-    if df is None:
-        return
+    with profiling.stage("Load data"):
+        # The data version is read once per rerun and passed down: a refresh publishing mid-rerun
+        # must not leave part of the page (or a cache entry) on the other version
+        version = load_version()
+        if version is None:
+            return
+        shards = select_shards(version)
+        df = load_data(version, shards)
+        if df is None:
+            return
     
-    # Define test maximum scores
-    test_max_scores = {
-        "Test 1": 20,
-        "Surprise Test": 20,
-        "Test 2": 20,
-        "Unit Test": 50
-    }
+    # Tests, maximum scores and subjects of this data version
+    tests = load_tests(version)
+    if tests is None:
+        return
+    test_max_scores, subject_cols, subjects_by_test = test_layout(version)
+    test_names = list(test_max_scores)
     
     # Sidebar for navigation
     st.sidebar.title("Navigation")
@@ -50,6 +398,7 @@ def main():
         "Performance Analysis", 
         "Contact Information"
     ])
+    profiling.section(page)
     
     # Overview Page
     if page == "Overview":
@@ -60,133 +409,54 @@ def main():
         with col1:
             st.metric("Total Students", len(df))
         
-        # Load all test data for overview
-        test1_df = load_test_data("Test 1")
-        surprise_df = load_test_data("Surprise Test")
-        test2_df = load_test_data("Test 2")
-        unit_df = load_test_data("Unit Test")
+        # Load the precomputed aggregates for all tests
+        with profiling.stage("Aggregates"):
+            aggregates = load_aggregates(version, shards)
         
-        if all([test1_df is not None, surprise_df is not None, test2_df is not None, unit_df is not None]):
-            # Calculate class averages as percentages
-            subject_cols = ["English Score", "Maths Score", "Science Score", "SST Score", "Hindi", "Marathi"]
-            
+        if aggregates is not None:
             with col2:
                 # Display test score information
-                st.info("📊 Test 1, Test 2, Surprise Test: Maximum score of 20 points\n\nUnit Test: Maximum score of 50 points")
+                st.info("📊 " + "\n\n".join(registry.max_score_summary(tests)))
             
             # Performance metrics
             st.subheader("Class Performance Metrics")
             
-            # Calculate overall averages as percentages
-            test1_pct = (test1_df[subject_cols].mean().mean() / test_max_scores["Test 1"]) * 100
-            surprise_pct = (surprise_df[subject_cols].mean().mean() / test_max_scores["Surprise Test"]) * 100
-            test2_pct = (test2_df[subject_cols].mean().mean() / test_max_scores["Test 2"]) * 100
-            unit_pct = (unit_df[subject_cols].mean().mean() / test_max_scores["Unit Test"]) * 100
+            # Overall averages as percentages
+            test_avgs = aggregates["test"]
             
             # Display metrics
-            metric_cols = st.columns(4)
-            with metric_cols[0]:
-                st.metric("Test 1 Performance", f"{test1_pct:.1f}%", 
-                          delta=f"{test1_df[subject_cols].mean().mean():.1f}/20")
-            with metric_cols[1]:
-                st.metric("Surprise Test Performance", f"{surprise_pct:.1f}%", 
-                          delta=f"{surprise_df[subject_cols].mean().mean():.1f}/20")
-            with metric_cols[2]:
-                st.metric("Test 2 Performance", f"{test2_pct:.1f}%", 
-                          delta=f"{test2_df[subject_cols].mean().mean():.1f}/20")
-            with metric_cols[3]:
-                st.metric("Unit Test Performance", f"{unit_pct:.1f}%", 
-                          delta=f"{unit_df[subject_cols].mean().mean():.1f}/50")
+            metric_cols = st.columns(len(test_names))
+            for metric_col, test_name in zip(metric_cols, test_names):
+                with metric_col:
+                    if pd.isna(test_avgs.loc[test_name, 'Percent']):
+                        # Registered but not sat yet
+                        st.metric(f"{test_name} Performance", "—")
+                        continue
+                    st.metric(f"{test_name} Performance", f"{test_avgs.loc[test_name, 'Percent']:.1f}%", 
+                              delta=f"{test_avgs.loc[test_name, 'Score']:.1f}/{test_max_scores[test_name]}")
             
             # Performance trend chart
             st.subheader("Performance Trends")
             
-            # Create normalized scores for comparison
-            test_names = ['Test 1', 'Surprise Test', 'Test 2', 'Unit Test']
-            test_avgs_pct = [test1_pct, surprise_pct, test2_pct, unit_pct]
-            
-            fig = px.line(
-                x=test_names, 
-                y=test_avgs_pct,
-                markers=True,
-                labels={"x": "Test", "y": "Average Score (%)"},
-                title="Class Average Performance Across Tests (Percentage)"
-            )
-            fig.update_layout(
-                xaxis=dict(tickmode='linear'),
-                yaxis=dict(range=[0, 100]),
-                hovermode="x unified"
+            show_figure(
+                (version, shards, "trend"),
+                lambda: charts.trend_line(test_names, test_avgs.loc[test_names, "Percent"].values)
             )
-            st.plotly_chart(fig, use_container_width=True)
             
             # Subject performance comparison
             st.subheader("Subject Performance Comparison")
             
-            # Calculate subject averages across tests (as percentages)
-            subject_data = []
-            
-            for subject in subject_cols:
-                subject_data.append({
-                    "Subject": subject,
-                    "Test 1": (test1_df[subject].mean() / test_max_scores["Test 1"]) * 100,
-                    "Surprise Test": (surprise_df[subject].mean() / test_max_scores["Surprise Test"]) * 100,
-                    "Test 2": (test2_df[subject].mean() / test_max_scores["Test 2"]) * 100,
-                    "Unit Test": (unit_df[subject].mean() / test_max_scores["Unit Test"]) * 100
-                })
-            
-            subject_df = pd.DataFrame(subject_data)
+            # Subject averages across tests (as percentages)
+            subject_matrix = aggregates["subject_test_pct"]
             
             # Create a heatmap for subject performance
-            fig = px.imshow(
-                subject_df[["Test 1", "Surprise Test", "Test 2", "Unit Test"]].values,
-                x=test_names,
-                y=subject_df["Subject"],
-                color_continuous_scale="RdYlGn",
-                labels=dict(x="Test", y="Subject", color="Score (%)"),
-                text_auto='.1f',
-                aspect="auto"
-            )
-            fig.update_layout(title="Subject Performance Heatmap (%)")
-            st.plotly_chart(fig, use_container_width=True)
+            show_figure((version, shards, "heatmap"), lambda: charts.subject_heatmap(subject_matrix, test_names))
             
-            # Top performers across all tests
+            # Top performers across all tests: the slot is reserved here and filled once the
+            # cheaper charts below have been sent, so they are not held back by the rankings
             st.subheader("Top Performers Overall")
-            
-            # Merge all test data with student info
-            student_info = df[['Student ID', 'Name']]
-            
-            # Calculate overall student performance
-            test1_with_names = pd.merge(test1_df, student_info, on='Student ID')
-            surprise_with_names = pd.merge(surprise_df, student_info, on='Student ID')
-            test2_with_names = pd.merge(test2_df, student_info, on='Student ID')
-            unit_with_names = pd.merge(unit_df, student_info, on='Student ID')
-            
-            # Calculate normalized scores (as percentage of max possible)
-            test1_with_names['Normalized Score'] = (test1_with_names[subject_cols].sum(axis=1) / (len(subject_cols) * test_max_scores["Test 1"])) * 100
-            surprise_with_names['Normalized Score'] = (surprise_with_names[subject_cols].sum(axis=1) / (len(subject_cols) * test_max_scores["Surprise Test"])) * 100
-            test2_with_names['Normalized Score'] = (test2_with_names[subject_cols].sum(axis=1) / (len(subject_cols) * test_max_scores["Test 2"])) * 100
-            unit_with_names['Normalized Score'] = (unit_with_names[subject_cols].sum(axis=1) / (len(subject_cols) * test_max_scores["Unit Test"])) * 100
-            
-            # Get top 5 students from each test
-            top_test1 = test1_with_names[['Student ID', 'Name', 'Normalized Score']].rename(columns={'Normalized Score': 'Test 1 Score (%)'}).sort_values('Test 1 Score (%)', ascending=False).head(5)
-            top_surprise = surprise_with_names[['Student ID', 'Name', 'Normalized Score']].rename(columns={'Normalized Score': 'Surprise Test Score (%)'}).sort_values('Surprise Test Score (%)', ascending=False).head(5)
-            top_test2 = test2_with_names[['Student ID', 'Name', 'Normalized Score']].rename(columns={'Normalized Score': 'Test 2 Score (%)'}).sort_values('Test 2 Score (%)', ascending=False).head(5)
-            top_unit = unit_with_names[['Student ID', 'Name', 'Normalized Score']].rename(columns={'Normalized Score': 'Unit Test Score (%)'}).sort_values('Unit Test Score (%)', ascending=False).head(5)
-            
-            # Display top performers in columns
-            top_cols = st.columns(4)
-            with top_cols[0]:
-                st.write("**Test 1 Top Performers**")
-                st.dataframe(top_test1[['Name', 'Test 1 Score (%)']], hide_index=True)
-            with top_cols[1]:
-                st.write("**Surprise Test Top Performers**")
-                st.dataframe(top_surprise[['Name', 'Surprise Test Score (%)']], hide_index=True)
-            with top_cols[2]:
-                st.write("**Test 2 Top Performers**")
-                st.dataframe(top_test2[['Name', 'Test 2 Score (%)']], hide_index=True)
-            with top_cols[3]:
-                st.write("**Unit Test Top Performers**")
-                st.dataframe(top_unit[['Name', 'Unit Test Score (%)']], hide_index=True)
+            top_performers = st.empty()
+            top_performers.info("Ranking students…")
         
         else:
             st.error("Could not load all test data. Please check the Excel file.")
@@ -196,32 +466,34 @@ def main():
         
         with col1:
             # Students by first letter of name
-            name_distribution = df['Name'].str[0].value_counts()
-            fig = px.pie(
-                names=name_distribution.index, 
-                values=name_distribution.values, 
-                title="Students by Name Initial"
+            show_figure(
+                (version, shards, "name_initials"),
+                lambda: charts.value_pie(df['Name'].str[0].value_counts(), "Students by Name Initial")
             )
-            st.plotly_chart(fig, use_container_width=True)
         
         with col2:
             # Phone number distribution
-            phone_prefix = df['Phone Number'].astype(str).str[:3].value_counts()
-            fig = px.bar(
-                x=phone_prefix.index, 
-                y=phone_prefix.values, 
-                title="Phone Number Prefixes"
+            show_figure(
+                (version, shards, "phone_prefixes"),
+                lambda: charts.value_bar(df['Phone Prefix'].value_counts(), "Phone Number Prefixes")
             )
-            st.plotly_chart(fig, use_container_width=True)
         with col3:
             # Parent contact distribution
-            parent_phone_prefix = df['Parent Phone Number'].astype(str).str[:3].value_counts()
-            fig = px.bar(
-                x=parent_phone_prefix.index, 
-                y=parent_phone_prefix.values, 
-                title="Parent Phone Number Prefixes"
+            show_figure(
+                (version, shards, "parent_phone_prefixes"),
+                lambda: charts.value_bar(df['Parent Phone Prefix'].value_counts(), "Parent Phone Number Prefixes")
             )
-            st.plotly_chart(fig, use_container_width=True)
+        
+        if aggregates is not None:
+            # Display top 5 students from each test in columns
+            with profiling.stage("Top performers"), top_performers.container():
+                top_cols = st.columns(len(test_names))
+                for top_col, test_name in zip(top_cols, test_names):
+                    score_col = f"{test_name} Score (%)"
+                    top_test = ranked_students(version, shards, "test", test_name).rename(columns={"Score (%)": score_col})
+                    with top_col:
+                        st.write(f"**{test_name} Top Performers**")
+                        st.dataframe(top_test[['Name', score_col]], hide_index=True)
     # Student Details Page
     elif page == "Student Details":
         st.header("Student Details")
@@ -229,22 +501,66 @@ def main():
         # Search and filter students
         search_term = st.text_input("Search Students by Name or ID")
         
-        if search_term:
-            filtered_df = df[
-                df['Name'].str.contains(search_term, case=False) | 
-                df['Student ID'].astype(str).str.contains(search_term)
-            ]
-        else:
-            filtered_df = df
+        with profiling.stage("Search"):
+            index = student_search_index(version, shards, df)
             
-        # Display students in a table
-        st.dataframe(filtered_df, use_container_width=True)
+            # Narrow the previous result while the user keeps typing the same query, but only over the
+            # same roster: its positions mean nothing once the data version or class selection changes
+            previous = st.session_state.get("student_search")
+            if previous is not None and previous[0] != (version, shards):
+                previous = None
+            matches = index.search(search_term, previous=previous and previous[1:])
+            st.session_state["student_search"] = ((version, shards), search_term, matches)
+        
+        # Sorted, filtered and paged on the server; only the visible page is sent to the browser
+        table = student_roster_table(version, shards, df)
+        columns = roster_columns(df)
+        sort_col, order_col, size_col = st.columns([2, 1, 1])
+        with sort_col:
+            sort_by = st.selectbox("Sort by", ["Search order"] + columns)
+        with order_col:
+            descending = st.selectbox("Order", ["Ascending", "Descending"]) == "Descending"
+        with size_col:
+            page_size = st.selectbox("Rows per page", roster_table.PAGE_SIZES, index=1)
+        filter_options = table.filter_options(ROSTER_FILTER_COLUMNS)
+        filters = []
+        if filter_options:
+            filter_cols = st.columns(len(filter_options))
+            for filter_col, (column, options) in zip(filter_cols, filter_options.items()):
+                with filter_col:
+                    filters.append((column, st.multiselect(column, options, key=f"roster_filter_{column}", placeholder="All")))
+        
+        with profiling.stage("Results table"):
+            rows = table.query(
+                matches,
+                filters,
+                sort_by=None if sort_by == "Search order" else sort_by,
+                ascending=not descending
+            )
+            page_count = max((len(rows) - 1) // page_size + 1, 1)
+            result_page = 1
+            if page_count > 1:
+                result_page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1)
+            page_rows = table.page(rows, result_page, page_size)
+            st.dataframe(page_rows, use_container_width=True, hide_index=True, column_order=columns)
+            first_row = (result_page - 1) * page_size
+            st.caption(f"Students {min(first_row + 1, len(rows))}–{first_row + len(page_rows)} of {len(rows)}")
+        
+        # The students on the visible page are offered for the detailed view
+        page_labels = {
+            f"{name} ({student_id})": student_id
+            for student_id, name in zip(page_rows['Student ID'].tolist(), page_rows['Name'])
+        }
         
         # Select a student for detailed view
-        selected_student = st.selectbox("Select a Student for Detailed View", filtered_df['Name'])
+        selected_label = st.selectbox("Select a Student for Detailed View", list(page_labels))
+        selected_student = page_labels.get(selected_label)
         
-        if selected_student:
-            student_details = filtered_df[filtered_df['Name'] == selected_student].iloc[0]
+        if selected_student is not None:
+            with profiling.stage("Student record"):
+                records = student_record_store(version, shards, df)
+                student_details = records.get(selected_student)
+                report_card = records.report_card(selected_student)
             
             # Display student details in columns
             col1, col2 = st.columns(2)
@@ -253,346 +569,243 @@ def main():
                 st.write(f"**Student ID:** {student_details['Student ID']}")
                 st.write(f"**Name:** {student_details['Name']}")
                 st.write(f"**Email:** {student_details['Email']}")
+                if 'Class' in student_details:
+                    st.write(f"**Class:** {student_details['School']} / {student_details['Class']}")
             
             with col2:
                 st.write(f"**Phone Number:** {student_details['Phone Number']}")
                 st.write(f"**Parent Phone Number:** {student_details['Parent Phone Number']}")
+            
+            # Report card across all tests
+            st.subheader("Report Card")
+            st.dataframe(
+                report_card,
+                use_container_width=True,
+                column_config={"Percent": st.column_config.NumberColumn("Percent (%)", format="%.1f")}
+            )
+        
+        # Report cards for every student in the current selection
+        st.subheader("Bulk Report Export")
+        command = "`python -m reports --output report_cards.zip`"
+        export = st.session_state.get("report_export")
+        if not st.get_option("server.enableStaticServing"):
+            st.info(f"Downloads need static file serving (server.enableStaticServing); export from the command line with {command}")
+        elif st.button(f"Build report cards for {len(df)} students"):
+            progress = st.progress(0.0, text="Rendering report cards...")
+            with profiling.stage("Report export"):
+                built = export_report_cards(
+                    version, shards, df, lambda done, total: progress.progress(done / max(total, 1))
+                )
+            if export is not None:
+                export.remove()
+            export = built
+            if os.path.getsize(export.path) > EXPORT_MAX_BYTES:
+                export.remove()
+                export = None
+                st.warning(f"The archive is too large to download from the dashboard; export it with {command}")
+            st.session_state["report_export"] = export
+        if export is not None and export.key == (version, shards) and os.path.exists(export.path):
+            # A plain link to the file; the browser fetches it from disk without it passing through the session
+            st.markdown(
+                f'<a href="app/static/exports/{os.path.basename(export.path)}" download="report_cards.zip">'
+                f'Download report cards (zip)</a>',
+                unsafe_allow_html=True
+            )
     # Performance Analysis Page
     elif page == "Performance Analysis":
         st.header("Performance Analysis")
         
-        # Add tabs for different test types
-        test_tab = st.tabs(["Test 1", "Surprise Test", "Test 2", "Unit Test", "Overall Performance"])
-        # Test 1 Tab
-        with test_tab[0]:
-            test1_df = load_test_data("Test 1")
-            if test1_df is not None:
-                st.subheader("Test 1 Results (Maximum Score: 20)")
-                        
-                # Summary statistics
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    avg_english = test1_df["English Score"].mean()
-                    avg_maths = test1_df["Maths Score"].mean()
-                    st.metric("Avg. English Score", f"{avg_english:.1f}/20", delta=f"{(avg_english/20)*100:.1f}%")
-                    st.metric("Avg. Maths Score", f"{avg_maths:.1f}/20", delta=f"{(avg_maths/20)*100:.1f}%")
-                
-                with col2:
-                    avg_science = test1_df["Science Score"].mean()
-                    avg_sst = test1_df["SST Score"].mean()
-                    st.metric("Avg. Science Score", f"{avg_science:.1f}/20", delta=f"{(avg_science/20)*100:.1f}%")
-                    st.metric("Avg. SST Score", f"{avg_sst:.1f}/20", delta=f"{(avg_sst/20)*100:.1f}%")
+        # One section per test plus the cohort-wide views. Unlike st.tabs, which runs every tab's block on
+        # each rerun, only the selected section's data is loaded and only its figures are built
+        section = st.radio(
+            "Section",
+            test_names + ["Overall Performance", "Trends", "Cohorts"],
+            horizontal=True,
+            key="analysis_section",
+            label_visibility="collapsed"
+        )
+        
+        with profiling.stage("Aggregates"):
+            aggregates = load_aggregates(version, shards)
+        
+        # Per-test sections
+        if section in test_names:
+            test_name = section
+            if aggregates is not None:
+                max_score = test_max_scores[test_name]
+                # Only the subjects the registry lists for this test
+                test_subjects = subjects_by_test.get(test_name, subject_cols)
+                subject_avgs = aggregates["test_subject"].loc[test_name].loc[test_subjects]
+                st.subheader(f"{test_name} Results (Maximum Score: {max_score})")
                 
-                with col3:
-                    avg_hindi = test1_df["Hindi"].mean()
-                    avg_marathi = test1_df["Marathi"].mean()
-                    st.metric("Avg. Hindi Score", f"{avg_hindi:.1f}/20", delta=f"{(avg_hindi/20)*100:.1f}%")
-                    st.metric("Avg. Marathi Score", f"{avg_marathi:.1f}/20", delta=f"{(avg_marathi/20)*100:.1f}%")
+                # Summary statistics, spread evenly over three columns
+                stat_cols = st.columns(3)
+                for i, subject in enumerate(test_subjects):
+                    avg_score = subject_avgs.loc[subject, "Score"]
+                    avg_pct = subject_avgs.loc[subject, "Percent"]
+                    with stat_cols[i * len(stat_cols) // len(test_subjects)]:
+                        st.metric(f"Avg. {subject_label(subject)}", f"{avg_score:.1f}/{max_score}", delta=f"{avg_pct:.1f}%")
                 
                 # Subject-wise performance chart
                 st.subheader("Subject-wise Performance")
-                subject_cols = ["English Score", "Maths Score", "Science Score", "SST Score", "Hindi", "Marathi"]
-                subject_avgs = [test1_df[col].mean() for col in subject_cols]
-                subject_pcts = [(avg / 20) * 100 for avg in subject_avgs]
                 
                 # Create a more informative bar chart with percentages
-                fig = px.bar(
-                    x=subject_cols,
-                    y=subject_avgs,
-                    labels={"x": "Subject", "y": "Average Score"},
-                    title="Average Scores by Subject (out of 20)",
-                    text=[f"{avg:.1f} ({pct:.1f}%)" for avg, pct in zip(subject_avgs, subject_pcts)]
+                show_figure(
+                    (version, shards, "subject_bar", test_name),
+                    lambda: charts.subject_bar(subject_avgs, max_score)
+                )
+        
+        # Overall Performance section
+        elif section == "Overall Performance":
+            st.subheader("Overall Academic Performance")
+            
+            if aggregates is not None:
+                # Display test score information
+                st.info("📊 " + "\n\n".join(registry.max_score_summary(tests)))
+                
+                # Subject averages across tests (as percentages)
+                subject_matrix = aggregates["subject_test_pct"]
+                
+                # Create a radar chart for subject performance comparison
+                show_figure((version, shards, "radar"), lambda: charts.subject_radar(subject_matrix, test_names))
+                
+                # Grade distribution analysis
+                st.subheader("Grade Distribution Analysis")
+                
+                # Grades under what-if thresholds, for the overall average or one test or subject
+                grade_measure = st.selectbox("Grade on", ["Overall"] + test_names + subject_cols)
+                thresholds = threshold_sliders()
+                cutoffs = list(thresholds.values())
+                if any(higher <= lower for higher, lower in zip(cutoffs, cutoffs[1:])):
+                    st.warning("Each grade's minimum must be above the next grade's.")
+                else:
+                    with profiling.stage("Grade distribution"):
+                        histogram = score_histograms(version, shards)[grade_measure]
+                        grade_counts = analytics.histogram_grade_counts(histogram, thresholds)
+                    title = "Overall Grade Distribution" if grade_measure == "Overall" else f"{grade_measure} Grade Distribution"
+                    show_figure(
+                        (version, shards, "grades", grade_measure, tuple(cutoffs)),
+                        lambda: charts.grade_distribution(grade_counts, title)
+                    )
+                
+                # Overall averages, binned on the server rather than sent student by student
+                show_figure(
+                    (version, shards, "overall_histogram"),
+                    lambda: charts.binned_histogram(
+                        aggregates["student_overall"]["Overall Average (%)"],
+                        "Distribution of Overall Averages",
+                        "Overall Average (%)"
+                    )
+                )
+                
+                # Students with the lowest overall average
+                st.subheader("Students at Risk")
+                at_risk_count = st.slider("Number of students", min_value=3, max_value=20, value=5)
+                with profiling.stage("Students at risk"):
+                    at_risk = ranked_students(version, shards, "overall", k=at_risk_count, largest=False)
+                st.dataframe(
+                    at_risk.rename(columns={"Score (%)": "Overall Average (%)"}),
+                    hide_index=True,
+                    use_container_width=True
                 )
-                fig.update_layout(
-                    yaxis=dict(range=[0, 20]),
-                    uniformtext_minsize=8,
-                    uniformtext_mode='hide'
+            else:
+                st.error("Could not load all test data. Please check the Excel file.")
+        
+        # Trends section
+        elif section == "Trends":
+            st.subheader("Progress Across Tests")
+            
+            if aggregates is not None:
+                # Class-level trend per subject
+                subject_trends = analytics.trend_summary(aggregates["subject_test_pct"][test_names])
+                st.dataframe(subject_trends, use_container_width=True)
+                
+                # Student trends, overall or within one subject
+                trend_subject = st.selectbox("Trend of", ["All subjects"] + subject_cols)
+                subject = None if trend_subject == "All subjects" else trend_subject
+                trend_count = st.slider("Number of students", min_value=3, max_value=50, value=10, key="trend_count")
+                with profiling.stage("Student trends"):
+                    trends = trend_table(version, shards, subject)
+                    improved = trend_ranking(version, shards, subject, k=trend_count)
+                    declining = trend_ranking(version, shards, subject, k=trend_count, largest=False)
+                
+                # Students per trend label
+                label_counts = trends["Trend"].value_counts(sort=False)
+                count_cols = st.columns(len(label_counts))
+                for count_col, (label, count) in zip(count_cols, label_counts.items()):
+                    with count_col:
+                        st.metric(f"{label} Students", count)
+                st.caption(
+                    f"Slope of a least-squares line through each student's test percentages, in percentage points "
+                    f"per test; trends of ±{analytics.TREND_THRESHOLD:g} points or more count as improving or declining."
                 )
-                st.plotly_chart(fig, use_container_width=True)
-        # Surprise Test Tab
-        with test_tab[1]:
-            surprise_df = load_test_data("Surprise Test")
-            if surprise_df is not None:
-                st.subheader("Surprise Test Results (Maximum Score: 20)")
                 
-                # Summary statistics
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    avg_english = surprise_df["English Score"].mean()
-                    avg_maths = surprise_df["Maths Score"].mean()
-                    st.metric("Avg. English Score", f"{avg_english:.1f}/20", delta=f"{(avg_english/20)*100:.1f}%")
-                    st.metric("Avg. Maths Score", f"{avg_maths:.1f}/20", delta=f"{(avg_maths/20)*100:.1f}%")
+                improved_col, declining_col = st.columns(2)
+                with improved_col:
+                    st.write("**Most Improved**")
+                    st.dataframe(improved, hide_index=True, use_container_width=True)
+                with declining_col:
+                    st.write("**Declining**")
+                    st.dataframe(declining, hide_index=True, use_container_width=True)
+            else:
+                st.error("Could not load all test data. Please check the Excel file.")
+        
+        # Cohorts section
+        elif section == "Cohorts":
+            st.subheader("Correlations and Percentiles")
+            
+            if aggregates is not None:
+                with profiling.stage("Distributions"):
+                    distributions = score_distributions(version, shards)
                 
-                with col2:
-                    avg_science = surprise_df["Science Score"].mean()
-                    avg_sst = surprise_df["SST Score"].mean()
-                    st.metric("Avg. Science Score", f"{avg_science:.1f}/20", delta=f"{(avg_science/20)*100:.1f}%")
-                    st.metric("Avg. SST Score", f"{avg_sst:.1f}/20", delta=f"{(avg_sst/20)*100:.1f}%")
+                corr_col1, corr_col2 = st.columns(2)
+                with corr_col1:
+                    show_figure(
+                        (version, shards, "subject_corr"),
+                        lambda: charts.correlation_heatmap(distributions["subject_corr"], "Subject-to-Subject Correlation")
+                    )
+                with corr_col2:
+                    show_figure(
+                        (version, shards, "test_corr"),
+                        lambda: charts.correlation_heatmap(distributions["test_corr"], "Test-to-Test Correlation")
+                    )
                 
-                with col3:
-                    avg_hindi = surprise_df["Hindi"].mean()
-                    avg_marathi = surprise_df["Marathi"].mean()
-                    st.metric("Avg. Hindi Score", f"{avg_hindi:.1f}/20", delta=f"{(avg_hindi/20)*100:.1f}%")
-                    st.metric("Avg. Marathi Score", f"{avg_marathi:.1f}/20", delta=f"{(avg_marathi/20)*100:.1f}%")
-                        
-                    # Subject-wise performance chart
-                    st.subheader("Subject-wise Performance")
-                    subject_cols = ["English Score", "Maths Score", "Science Score", "SST Score", "Hindi", "Marathi"]
-                    subject_avgs = [surprise_df[col].mean() for col in subject_cols]
-                    subject_pcts = [(avg / 20) * 100 for avg in subject_avgs]
-                    
-                    # Create a more informative bar chart with percentages
-                    fig = px.bar(
-                        x=subject_cols,
-                        y=subject_avgs,
-                        labels={"x": "Subject", "y": "Average Score"},
-                        title="Average Scores by Subject (out of 20)",
-                        text=[f"{avg:.1f} ({pct:.1f}%)" for avg, pct in zip(subject_avgs, subject_pcts)]
+                band_col1, band_col2 = st.columns(2)
+                with band_col1:
+                    show_figure(
+                        (version, shards, "test_bands"),
+                        lambda: charts.percentile_bands(distributions["test_bands"], "Percentile Bands by Test", "Test")
                     )
-                    fig.update_layout(
-                        yaxis=dict(range=[0, 20]),
-                        uniformtext_minsize=8,
-                        uniformtext_mode='hide'
+                with band_col2:
+                    show_figure(
+                        (version, shards, "subject_bands"),
+                        lambda: charts.percentile_bands(distributions["subject_bands"], "Percentile Bands by Subject", "Subject")
                     )
-                    st.plotly_chart(fig, use_container_width=True)
-        # Test 2 Tab
-                with test_tab[2]:
-                    test2_df = load_test_data("Test 2")
-                    if test2_df is not None:
-                        st.subheader("Test 2 Results (Maximum Score: 20)")
-                        
-                        # Summary statistics
-                        col1, col2, col3 = st.columns(3)
-                        with col1:
-                            avg_english = test2_df["English Score"].mean()
-                            avg_maths = test2_df["Maths Score"].mean()
-                            st.metric("Avg. English Score", f"{avg_english:.1f}/20", delta=f"{(avg_english/20)*100:.1f}%")
-                            st.metric("Avg. Maths Score", f"{avg_maths:.1f}/20", delta=f"{(avg_maths/20)*100:.1f}%")
-                        
-                        with col2:
-                            avg_science = test2_df["Science Score"].mean()
-                            avg_sst = test2_df["SST Score"].mean()
-                            st.metric("Avg. Science Score", f"{avg_science:.1f}/20", delta=f"{(avg_science/20)*100:.1f}%")
-                            st.metric("Avg. SST Score", f"{avg_sst:.1f}/20", delta=f"{(avg_sst/20)*100:.1f}%")
-                        
-                        with col3:
-                            avg_hindi = test2_df["Hindi"].mean()
-                            avg_marathi = test2_df["Marathi"].mean()
-                            st.metric("Avg. Hindi Score", f"{avg_hindi:.1f}/20", delta=f"{(avg_hindi/20)*100:.1f}%")
-                            st.metric("Avg. Marathi Score", f"{avg_marathi:.1f}/20", delta=f"{(avg_marathi/20)*100:.1f}%")
-                        
-                        # Subject-wise performance chart
-                        st.subheader("Subject-wise Performance")
-                        subject_cols = ["English Score", "Maths Score", "Science Score", "SST Score", "Hindi", "Marathi"]
-                        subject_avgs = [test2_df[col].mean() for col in subject_cols]
-                        subject_pcts = [(avg / 20) * 100 for avg in subject_avgs]
-                        
-                        # Create a more informative bar chart with percentages
-                        fig = px.bar(
-                            x=subject_cols,
-                            y=subject_avgs,
-                            labels={"x": "Subject", "y": "Average Score"},
-                            title="Average Scores by Subject (out of 20)",
-                            text=[f"{avg:.1f} ({pct:.1f}%)" for avg, pct in zip(subject_avgs, subject_pcts)]
-                        )
-                        fig.update_layout(
-                            yaxis=dict(range=[0, 20]),
-                            uniformtext_minsize=8,
-                            uniformtext_mode='hide'
-                        )
-                        st.plotly_chart(fig, use_container_width=True)
-        # Unit Test Tab
-        with test_tab[3]:
-                    unit_df = load_test_data("Unit Test")
-                    if unit_df is not None:
-                        st.subheader("Unit Test Results (Maximum Score: 50)")
-                        
-                        # Summary statistics
-                        col1, col2, col3 = st.columns(3)
-                        with col1:
-                            avg_english = unit_df["English Score"].mean()
-                            avg_maths = unit_df["Maths Score"].mean()
-                            st.metric("Avg. English Score", f"{avg_english:.1f}/50", delta=f"{(avg_english/50)*100:.1f}%")
-                            st.metric("Avg. Maths Score", f"{avg_maths:.1f}/50", delta=f"{(avg_maths/50)*100:.1f}%")
-                        
-                        with col2:
-                            avg_science = unit_df["Science Score"].mean()
-                            avg_sst = unit_df["SST Score"].mean()
-                            st.metric("Avg. Science Score", f"{avg_science:.1f}/50", delta=f"{(avg_science/50)*100:.1f}%")
-                            st.metric("Avg. SST Score", f"{avg_sst:.1f}/50", delta=f"{(avg_sst/50)*100:.1f}%")
-                        
-                        with col3:
-                            avg_hindi = unit_df["Hindi"].mean()
-                            avg_marathi = unit_df["Marathi"].mean()
-                            st.metric("Avg. Hindi Score", f"{avg_hindi:.1f}/50", delta=f"{(avg_hindi/50)*100:.1f}%")
-                            st.metric("Avg. Marathi Score", f"{avg_marathi:.1f}/50", delta=f"{(avg_marathi/50)*100:.1f}%")
-                        
-                        # Subject-wise performance chart
-                        st.subheader("Subject-wise Performance")
-                        subject_cols = ["English Score", "Maths Score", "Science Score", "SST Score", "Hindi", "Marathi"]
-                        subject_avgs = [unit_df[col].mean() for col in subject_cols]
-                        subject_pcts = [(avg / 50) * 100 for avg in subject_avgs]
-                        
-                        # Create a more informative bar chart with percentages
-                        fig = px.bar(
-                            x=subject_cols,
-                            y=subject_avgs,
-                            labels={"x": "Subject", "y": "Average Score"},
-                            title="Average Scores by Subject (out of 50)",
-                            text=[f"{avg:.1f} ({pct:.1f}%)" for avg, pct in zip(subject_avgs, subject_pcts)]
-                        )
-                        fig.update_layout(
-                            yaxis=dict(range=[0, 50]),
-                            uniformtext_minsize=8,
-                            uniformtext_mode='hide'
-                        )
-                        st.plotly_chart(fig, use_container_width=True)
-        # Overall Performance Tab
-        with test_tab[4]:
-                    st.subheader("Overall Academic Performance")
-                    
-                    # Load all test data
-                    test1_df = load_test_data("Test 1")
-                    surprise_df = load_test_data("Surprise Test")
-                    test2_df = load_test_data("Test 2")
-                    unit_df = load_test_data("Unit Test")
-                    
-                    if all([test1_df is not None, surprise_df is not None, test2_df is not None, unit_df is not None]):
-                        # Define test maximum scores
-                        test_max_scores = {
-                            "Test 1": 20,
-                            "Surprise Test": 20,
-                            "Test 2": 20,
-                            "Unit Test": 50
-                        }
-                        
-                        # Display test score information
-                        st.info("📊 Test 1, Test 2, Surprise Test: Maximum score of 20 points\n\nUnit Test: Maximum score of 50 points")
-                        
-                        # Merge with student info
-                        student_info = df[['Student ID', 'Name']]
-                        
-                        # Calculate average scores for each test
-                        subject_cols = ["English Score", "Maths Score", "Science Score", "SST Score", "Hindi", "Marathi"]
-                        
-                        # Calculate normalized scores (as percentage of max possible)
-                        test1_avg_pct = (test1_df[subject_cols].mean(axis=1) / 20) * 100
-                        surprise_avg_pct = (surprise_df[subject_cols].mean(axis=1) / 20) * 100
-                        test2_avg_pct = (test2_df[subject_cols].mean(axis=1) / 20) * 100
-                        unit_avg_pct = (unit_df[subject_cols].mean(axis=1) / 50) * 100
-                        
-                        # Define test names for charts
-                        test_names = ['Test 1', 'Surprise Test', 'Test 2', 'Unit Test']
-                        
-                        # Calculate subject averages across tests (as percentages)
-                        subject_data = []
-                        
-                        for subject in subject_cols:
-                            subject_data.append({
-                                "Subject": subject,
-                                "Test 1": (test1_df[subject].mean() / test_max_scores["Test 1"]) * 100,
-                                "Surprise Test": (surprise_df[subject].mean() / test_max_scores["Surprise Test"]) * 100,
-                                "Test 2": (test2_df[subject].mean() / test_max_scores["Test 2"]) * 100,
-                                "Unit Test": (unit_df[subject].mean() / test_max_scores["Unit Test"]) * 100
-                            })
-                        
-                        subject_df = pd.DataFrame(subject_data)
-                        
-                        # Create a radar chart for subject performance comparison
-                        fig = go.Figure()
-                        
-                        for subject in subject_df["Subject"]:
-                            subject_row = subject_df[subject_df["Subject"] == subject]
-                            fig.add_trace(go.Scatterpolar(
-                                r=subject_row.iloc[0, 1:].values,
-                                theta=test_names,
-                                fill='toself',
-                                name=subject
-                            ))
-                        
-                        fig.update_layout(
-                            polar=dict(
-                                radialaxis=dict(
-                                    visible=True,
-                                    range=[0, 100]
-                                )
-                            ),
-                            title="Subject Performance Across Tests (%)",
-                            showlegend=True
-                        )
-                        st.plotly_chart(fig, use_container_width=True)
-                        
-                        # Grade distribution analysis
-                        st.subheader("Grade Distribution Analysis")
-                        
-                        # Define grade ranges
-                        def assign_grade(score):
-                            if score >= 90:
-                                return "A"
-                            elif score >= 80:
-                                return "B"
-                            elif score >= 70:
-                                return "C"
-                            elif score >= 60:
-                                return "D"
-                            else:
-                                return "F"
-                        
-                        # Create overall performance dataframe
-                        # Merge test data with student names
-                        test1_with_names = pd.merge(test1_df, student_info, on='Student ID')
-                        surprise_with_names = pd.merge(surprise_df, student_info, on='Student ID')
-                        test2_with_names = pd.merge(test2_df, student_info, on='Student ID')
-                        unit_with_names = pd.merge(unit_df, student_info, on='Student ID')
-                        
-                        # Calculate overall average for each student
-                        overall_with_names = pd.DataFrame({
-                            "Student ID": test1_with_names["Student ID"],
-                            "Name": test1_with_names["Name"],
-                            "Test 1 Average (%)": test1_avg_pct,
-                            "Surprise Test Average (%)": surprise_avg_pct,
-                            "Test 2 Average (%)": test2_avg_pct,
-                            "Unit Test Average (%)": unit_avg_pct
-                        })
-                        
-                        # Calculate overall average across all tests
-                        overall_with_names["Overall Average (%)"] = overall_with_names[["Test 1 Average (%)", "Surprise Test Average (%)", 
-                                                                                "Test 2 Average (%)", "Unit Test Average (%)"]].mean(axis=1)
-                        
-                        # Add grades to overall dataframe
-                        overall_with_names["Grade"] = overall_with_names["Overall Average (%)"].apply(assign_grade)
-                        
-                        # Create grade distribution chart
-                        grade_counts = overall_with_names["Grade"].value_counts().reset_index()
-                        grade_counts.columns = ["Grade", "Count"]
-                        
-                        # Sort grades in correct order
-                        grade_order = {"A": 1, "B": 2, "C": 3, "D": 4, "F": 5}
-                        grade_counts["Order"] = grade_counts["Grade"].map(grade_order)
-                        grade_counts = grade_counts.sort_values("Order")
-                        
-                        fig = px.bar(
-                            grade_counts,
-                            x="Grade",
-                            y="Count",
-                            color="Grade",
-                            text="Count",
-                            title="Overall Grade Distribution",
-                            color_discrete_map={
-                                "A": "green",
-                                "B": "lightgreen",
-                                "C": "yellow",
-                                "D": "orange",
-                                "F": "red"
-                            }
-                        )
-                        fig.update_layout(
-                            xaxis_title="Grade",
-                            yaxis_title="Number of Students"
-                        )
-                        st.plotly_chart(fig, use_container_width=True)
-                    else:
-                        st.error("Could not load all test data. Please check the Excel file.")
+                
+                # Two cohorts picked by filter, compared measure by measure
+                st.subheader("Cohort Comparison")
+                attributes = cohort_attributes(version, shards)
+                filter_col_a, filter_col_b = st.columns(2)
+                with filter_col_a:
+                    filters_a = cohort_filters("Cohort A", attributes)
+                with filter_col_b:
+                    filters_b = cohort_filters("Cohort B", attributes)
+                
+                with profiling.stage("Cohort comparison"):
+                    result = cohort_comparison(version, shards, filters_a, filters_b)
+                size_col_a, size_col_b = st.columns(2)
+                with size_col_a:
+                    st.metric("Cohort A Students", int(result["sizes"]["Cohort A"]))
+                with size_col_b:
+                    st.metric("Cohort B Students", int(result["sizes"]["Cohort B"]))
+                
+                show_figure(
+                    (version, shards, "cohorts", filters_a, filters_b),
+                    lambda: charts.cohort_comparison(result["comparison"])
+                )
+                st.dataframe(result["comparison"], use_container_width=True)
+            else:
+                st.error("Could not load all test data. Please check the Excel file.")
             
     # Contact Information Page
     elif page == "Contact Information":
@@ -659,6 +872,15 @@ def main():
         # Add a map placeholder
         st.image("https://via.placeholder.com/800x400?text=School+Location+Map", caption="School Location Map")
 
+def main():
+    profiling.start_rerun()
+    try:
+        dashboard()
+    finally:
+        summary = profiling.finish_rerun()
+    if profiling.ADMIN_PANEL:
+        profiling_panel(summary)
+
 # Run the application
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,98 @@
+"""Write synthetic workbooks with the same layout as StudentData.xlsx.
+
+    python -m benchmarks.generate_data --sizes 1000 100000 1000000
+"""
+import argparse
+import os
+
+import numpy as np
+from openpyxl import Workbook
+
+import analytics
+import data_loader
+
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+OUTPUT_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+FIRST_ID = 100001
+SYLLABLES = np.array(['ra', 'ma', 'sa', 'ta', 'ka', 'ni', 'shi', 'pri', 'ya', 'an', 'vi', 'jay', 'dev', 'esh',
+                      'ro', 'mi', 'su', 'ha', 'la', 'geet'])
+
+# Mean share of the maximum score per subject, so the cohort is not uniformly average
+SUBJECT_DIFFICULTY = [0.75, 0.8, 0.8, 0.65, 0.78, 0.8]
+
+
+def workbook_path(students, output_dir=OUTPUT_DIR):
+    return os.path.join(output_dir, f"students_{students}.xlsx")
+
+
+def random_names(students, rng):
+    # Two to four syllables per name keeps names realistic and search selective
+    lengths = rng.integers(2, 5, size=students)
+    picks = rng.integers(0, len(SYLLABLES), size=(students, 4))
+    parts = SYLLABLES[picks]
+    return [''.join(row[:length]).title() for row, length in zip(parts, lengths)]
+
+
+def student_info(students, rng):
+    student_ids = np.arange(FIRST_ID, FIRST_ID + students)
+    names = random_names(students, rng)
+    phones = rng.integers(7_000_000_000, 9_999_999_999, size=students)
+    parent_phones = rng.integers(7_000_000_000, 9_999_999_999, size=students)
+    header = ['Student ID', 'Name', 'Email', 'Phone Number', 'Parent Phone Number']
+    rows = (
+        (int(student_id), name, f"{name.lower()}{student_id}@example.com", int(phone), int(parent_phone))
+        for student_id, name, phone, parent_phone in zip(student_ids, names, phones, parent_phones)
+    )
+    return header, rows
+
+
+def test_scores(students, max_score, ability, rng):
+    # Each student's ability carries across tests; a few percent of students miss the test
+    student_ids = np.arange(FIRST_ID, FIRST_ID + students)
+    difficulty = np.array(SUBJECT_DIFFICULTY)
+    scores = rng.normal(loc=(ability[:, None] * difficulty[None, :]) * max_score, scale=0.1 * max_score)
+    scores = np.clip(np.rint(scores), 0, max_score).astype(int)
+    sat = rng.random(students) > 0.02
+    order = rng.permutation(np.flatnonzero(sat))
+
+    header = ['Student ID'] + analytics.SUBJECT_COLS
+    rows = ([int(student_ids[i])] + scores[i].tolist() for i in order)
+    return header, rows
+
+
+def write_workbook(path, students, seed=0):
+    """Write one synthetic workbook; uses openpyxl's streaming writer so memory stays flat."""
+    rng = np.random.default_rng(seed)
+    ability = np.clip(rng.normal(1.0, 0.15, size=students), 0.3, 1.3)
+
+    sheets = [(data_loader.STUDENT_INFO_SHEET, student_info(students, rng))]
+    for test_name, max_score in analytics.TEST_MAX_SCORES.items():
+        sheets.append((test_name, test_scores(students, max_score, ability, rng)))
+
+    workbook = Workbook(write_only=True)
+    for sheet_name, (header, rows) in sheets:
+        sheet = workbook.create_sheet(sheet_name)
+        sheet.append(header)
+        for row in rows:
+            sheet.append(row)
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    workbook.save(path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="number of students per workbook")
+    parser.add_argument('--output-dir', default=OUTPUT_DIR)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for students in args.sizes:
+        path = write_workbook(workbook_path(students, args.output_dir), students, seed=args.seed)
+        print(f"{students:>9} students -> {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Time the dashboard's data work on synthetic workbooks, without starting Streamlit.
+
+    python -m benchmarks.run_benchmarks --sizes 1000 100000 1000000 [--json results.json]
+
+Missing workbooks are generated first (see benchmarks.generate_data).
+"""
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+
+import analytics
+import data_loader
+import ingest
+import search
+from benchmarks import generate_data
+
+SEARCH_QUERIES = ['ra', 'pri', 'jaydev', 'shi', '1000', '100042']
+
+
+def time_stage(fn, repeat=3):
+    # Best of a few runs; returns (seconds, result of the last run)
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def benchmark_workbook(path, repeat=3, streaming=False):
+    """Run every stage against one workbook and return {stage: seconds}."""
+    timings = {}
+
+    timings['parse workbook'], sheets = time_stage(lambda: data_loader.read_workbook(path), repeat=1)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        data_loader.load_workbook(path, cache_dir=cache_dir)
+        timings['load from columnar cache'], _ = time_stage(
+            lambda: data_loader.load_workbook(path, cache_dir=cache_dir), repeat)
+
+    if streaming:
+        timings['streaming aggregates'], _ = time_stage(
+            lambda: ingest.stream_aggregates(path, sheets[data_loader.STUDENT_INFO_SHEET]), repeat=1)
+
+    student_info = sheets[data_loader.STUDENT_INFO_SHEET]
+    test_sheets = {name: sheets[name] for name in analytics.TEST_NAMES}
+
+    timings['build fact table'], _ = time_stage(lambda: analytics.build_score_facts(test_sheets), repeat)
+    # The dashboard folds the sheets through the incremental engine: a fresh engine folds every sheet,
+    # a warm one only re-hashes them when a new data version leaves the scores unchanged
+    timings['overview aggregates'], _ = time_stage(
+        lambda: ingest.IncrementalAggregates().update(test_sheets, student_info), repeat)
+    engine = ingest.IncrementalAggregates()
+    engine.update(test_sheets, student_info)
+    timings['overview aggregates (warm)'], aggregates = time_stage(
+        lambda: engine.update(test_sheets, student_info), repeat)
+
+    timings['build search index'], index = time_stage(lambda: search.StudentSearchIndex(student_info), repeat=1)
+    timings['search (per query)'], _ = time_stage(
+        lambda: [index.search(query) for query in SEARCH_QUERIES], repeat)
+    timings['search (per query)'] /= len(SEARCH_QUERIES)
+
+    timings['top performers'], _ = time_stage(
+        lambda: [analytics.rank_students(aggregates, 'test', test_name) for test_name in analytics.TEST_NAMES],
+        repeat)
+    timings['grade distribution'], _ = time_stage(
+        lambda: analytics.grade_counts(
+            analytics.student_overall(aggregates['student_test_pct'], student_info)['Grade']),
+        repeat)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=generate_data.DEFAULT_SIZES)
+    parser.add_argument('--data-dir', default=generate_data.OUTPUT_DIR)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--streaming', action='store_true', help="also time the chunked streaming path")
+    parser.add_argument('--json', help="write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for students in args.sizes:
+        path = generate_data.workbook_path(students, args.data_dir)
+        if not os.path.exists(path):
+            print(f"Generating {path} ...")
+            generate_data.write_workbook(path, students)
+
+        timings = benchmark_workbook(path, repeat=args.repeat, streaming=args.streaming)
+        results.append({'students': students, 'workbook': path, 'timings': timings})
+
+        print(f"\n{students:,} students")
+        for stage, seconds in timings.items():
+            print(f"  {stage:<28} {seconds * 1000:>12.2f} ms")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'results': results,
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
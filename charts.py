@@ -0,0 +1,176 @@
+import numpy as np
+import plotly.express as px
+import plotly.graph_objs as go
+
+# Chart values are shown with one decimal, so two are plenty to send to the browser
+ROUND_DIGITS = 2
+
+# Score histograms are binned on the server into this many bins
+HISTOGRAM_BINS = 50
+
+GRADE_COLORS = {
+    "A": "green",
+    "B": "lightgreen",
+    "C": "yellow",
+    "D": "orange",
+    "F": "red"
+}
+
+
+def _round(values):
+    return np.round(np.asarray(values, dtype="float64"), ROUND_DIGITS)
+
+
+def trend_line(test_names, test_pcts):
+    fig = px.line(
+        x=test_names,
+        y=_round(test_pcts),
+        markers=True,
+        labels={"x": "Test", "y": "Average Score (%)"},
+        title="Class Average Performance Across Tests (Percentage)"
+    )
+    fig.update_layout(
+        xaxis=dict(tickmode='linear'),
+        yaxis=dict(range=[0, 100]),
+        hovermode="x unified"
+    )
+    return fig
+
+
+def subject_heatmap(subject_matrix, test_names):
+    fig = px.imshow(
+        _round(subject_matrix[test_names].values),
+        x=test_names,
+        y=list(subject_matrix.index),
+        color_continuous_scale="RdYlGn",
+        labels=dict(x="Test", y="Subject", color="Score (%)"),
+        text_auto='.1f',
+        aspect="auto"
+    )
+    fig.update_layout(title="Subject Performance Heatmap (%)")
+    return fig
+
+
+def subject_bar(subject_avgs, max_score):
+    """Average raw score per subject for one test, labelled with the percentage."""
+    fig = px.bar(
+        x=list(subject_avgs.index),
+        y=_round(subject_avgs["Score"]),
+        labels={"x": "Subject", "y": "Average Score"},
+        title=f"Average Scores by Subject (out of {max_score})",
+        text=[f"{avg:.1f} ({pct:.1f}%)" for avg, pct in zip(subject_avgs["Score"], subject_avgs["Percent"])]
+    )
+    fig.update_layout(
+        yaxis=dict(range=[0, max_score]),
+        uniformtext_minsize=8,
+        uniformtext_mode='hide'
+    )
+    return fig
+
+
+def subject_radar(subject_matrix, test_names):
+    fig = go.Figure()
+    for subject, subject_row in subject_matrix.iterrows():
+        fig.add_trace(go.Scatterpolar(
+            r=_round(subject_row[test_names].values),
+            theta=test_names,
+            fill='toself',
+            name=subject
+        ))
+    fig.update_layout(
+        polar=dict(
+            radialaxis=dict(
+                visible=True,
+                range=[0, 100]
+            )
+        ),
+        title="Subject Performance Across Tests (%)",
+        showlegend=True
+    )
+    return fig
+
+
+def grade_distribution(grade_counts, title="Overall Grade Distribution"):
+    """Bar chart of students per grade from precomputed counts."""
+    counts = grade_counts.rename_axis("Grade").reset_index(name="Count")
+    counts["Grade"] = counts["Grade"].astype(str)
+    fig = px.bar(
+        counts,
+        x="Grade",
+        y="Count",
+        color="Grade",
+        text="Count",
+        title=title,
+        color_discrete_map=GRADE_COLORS
+    )
+    fig.update_layout(
+        xaxis_title="Grade",
+        yaxis_title="Number of Students"
+    )
+    return fig
+
+
+def value_pie(counts, title):
+    return px.pie(names=counts.index, values=counts.values, title=title)
+
+
+def value_bar(counts, title):
+    return px.bar(x=counts.index, y=counts.values, title=title)
+
+
+def binned_histogram(values, title, x_label, bins=HISTOGRAM_BINS, value_range=(0, 100)):
+    """Histogram binned on the server, so only the bin counts reach the browser."""
+    values = np.asarray(values, dtype="float64")
+    counts, edges = np.histogram(values[~np.isnan(values)], bins=bins, range=value_range)
+    fig = go.Figure(go.Bar(
+        x=_round((edges[:-1] + edges[1:]) / 2),
+        y=counts,
+        width=np.diff(edges),
+        marker_line_width=0
+    ))
+    fig.update_layout(title=title, xaxis_title=x_label, yaxis_title="Number of Students", bargap=0)
+    return fig
+
+
+def correlation_heatmap(corr, title):
+    """Correlation matrix on a diverging scale fixed to [-1, 1]."""
+    fig = px.imshow(
+        _round(corr.values),
+        x=list(corr.columns),
+        y=list(corr.index),
+        color_continuous_scale="RdBu",
+        zmin=-1,
+        zmax=1,
+        labels=dict(color="Correlation"),
+        text_auto='.2f',
+        aspect="auto"
+    )
+    fig.update_layout(title=title)
+    return fig
+
+
+def percentile_bands(bands, title, x_label):
+    """Outer and inner percentile ranges as shaded bands around the median, per column of the bands table."""
+    x = list(bands.index)
+    outer_low, inner_low, median, inner_high, outer_high = (bands[col] for col in bands.columns)
+    fig = go.Figure()
+    for low, high, label, opacity in ((outer_low, outer_high, f"{bands.columns[0]}–{bands.columns[-1]}", 0.2),
+                                      (inner_low, inner_high, f"{bands.columns[1]}–{bands.columns[-2]}", 0.4)):
+        fig.add_trace(go.Scatter(x=x, y=_round(high), mode="lines", line=dict(width=0), showlegend=False,
+                                 hoverinfo="skip"))
+        fig.add_trace(go.Scatter(x=x, y=_round(low), mode="lines", line=dict(width=0), fill="tonexty",
+                                 fillcolor=f"rgba(31, 119, 180, {opacity})", name=label))
+    fig.add_trace(go.Scatter(x=x, y=_round(median), mode="lines+markers", name="Median",
+                             line=dict(color="rgb(31, 119, 180)")))
+    fig.update_layout(title=title, xaxis_title=x_label, yaxis_title="Score (%)", yaxis=dict(range=[0, 100]))
+    return fig
+
+
+def cohort_comparison(comparison, title="Cohort Comparison (%)"):
+    """Grouped bars of the two cohorts' mean percentages per measure."""
+    fig = go.Figure([
+        go.Bar(x=list(comparison.index), y=_round(comparison[cohort]), name=cohort)
+        for cohort in ("Cohort A", "Cohort B")
+    ])
+    fig.update_layout(title=title, barmode="group", yaxis=dict(range=[0, 100]), yaxis_title="Average Score (%)")
+    return fig
@@ -0,0 +1,300 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# Default workbook (or directory of per-class workbooks) and on-disk cache location
+WORKBOOK_PATH = os.environ.get('STUDENT_DATA_PATH', 'StudentData.xlsx')
+CACHE_DIR = os.environ.get('STUDENT_DATA_CACHE_DIR', '.data_cache')
+STUDENT_INFO_SHEET = 'Student information'
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# Roster column types applied after parsing. "category" for short repeating labels, "text" for
+# Arrow-backed strings, and "label" picks a category only when values repeat enough to pay off
+ROSTER_SCHEMA = {
+    'Name': 'label',
+    'Email': 'text',
+    'School': 'category',
+    'Class': 'category',
+    'Phone Prefix': 'category',
+    'Parent Phone Prefix': 'category',
+}
+TEXT_DTYPE = 'string[pyarrow]' if HAS_PYARROW else object
+
+# Derived once at load time, so charts never rebuild string copies of the phone numbers
+PHONE_PREFIX_COLUMNS = {
+    'Phone Number': 'Phone Prefix',
+    'Parent Phone Number': 'Parent Phone Prefix',
+}
+PHONE_PREFIX_DIGITS = 3
+
+# Part of the snapshot directory name; bumped whenever the stored sheet schema changes
+SNAPSHOT_FORMAT = 2
+
+# Marks never exceed this, so complete integer score columns fit in int8
+INT8_MAX = 127
+
+# Data versions kept readable at once: the published one and the one before it, so requests that
+# started before a refresh finish on the data they began with
+KEEP_VERSIONS = 2
+
+
+def _content_hash(path):
+    # Hash the raw workbook bytes in blocks so large files stay cheap to fingerprint
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _path_key(path):
+    # Workbooks with the same file name in different folders get separate cache entries
+    abs_path = os.path.abspath(path)
+    stem = os.path.splitext(os.path.basename(abs_path))[0]
+    return f"{stem}-{hashlib.sha1(abs_path.encode()).hexdigest()[:8]}"
+
+
+def _pointer_path(path, cache_dir):
+    return os.path.join(cache_dir, f"{_path_key(path)}.latest.json")
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, payload):
+    # Write to a temp file first so readers never see a half-written pointer
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+
+
+def workbook_version(path=WORKBOOK_PATH, cache_dir=CACHE_DIR):
+    """Return the content hash of the workbook, reusing the last hash while mtime and size are unchanged."""
+    stat = os.stat(path)
+    pointer = _read_json(_pointer_path(path, cache_dir))
+    if pointer and pointer.get('mtime_ns') == stat.st_mtime_ns and pointer.get('size') == stat.st_size:
+        return pointer['hash']
+
+    version = _content_hash(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    _write_json(_pointer_path(path, cache_dir), {
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'hash': version,
+    })
+    return version
+
+
+def _pinned_path(path, version, cache_dir):
+    return os.path.join(cache_dir, f"{_path_key(path)}-{version[:16]}{os.path.splitext(path)[1]}")
+
+
+def pinned_workbook(path, version, cache_dir=CACHE_DIR):
+    """Path of the copy pin_workbook made of a workbook version."""
+    return _pinned_path(path, version, cache_dir)
+
+
+def pin_workbook(path=WORKBOOK_PATH, cache_dir=CACHE_DIR, keep=KEEP_VERSIONS):
+    """Copy the workbook to an immutable file for its current version, and return that version.
+
+    The copy is what gets hashed, so the version names exactly the bytes that will be read, even if
+    the workbook is saved again meanwhile. Only the newest ``keep`` copies and their snapshots are kept.
+    """
+    stat = os.stat(path)
+    pointer = _read_json(_pointer_path(path, cache_dir))
+    if pointer and pointer.get('mtime_ns') == stat.st_mtime_ns and pointer.get('size') == stat.st_size:
+        if os.path.exists(_pinned_path(path, pointer['hash'], cache_dir)):
+            return pointer['hash']
+
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    os.close(fd)
+    shutil.copyfile(path, tmp_path)
+    version = _content_hash(tmp_path)
+    os.replace(tmp_path, _pinned_path(path, version, cache_dir))
+
+    # The pointer may only vouch for the file it was taken from if that file did not change while copied
+    after = os.stat(path)
+    if (after.st_mtime_ns, after.st_size) == (stat.st_mtime_ns, stat.st_size):
+        _write_json(_pointer_path(path, cache_dir), {
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'hash': version,
+        })
+    _prune_pinned(path, cache_dir, keep)
+    return version
+
+
+def _pinned_versions(path, cache_dir):
+    # (mtime, version prefix, file path) of every pinned copy of the workbook
+    prefix, extension = f"{_path_key(path)}-", os.path.splitext(path)[1]
+    return [
+        (entry.stat().st_mtime_ns, entry.name[len(prefix):len(entry.name) - len(extension)], entry.path)
+        for entry in os.scandir(cache_dir)
+        if entry.is_file() and entry.name.startswith(prefix) and entry.name.endswith(extension)
+    ]
+
+
+def _prune_pinned(path, cache_dir, keep):
+    # Copies of older versions go together with their snapshots
+    for _, version, pinned_path in sorted(_pinned_versions(path, cache_dir), reverse=True)[keep:]:
+        try:
+            os.remove(pinned_path)
+        except OSError:
+            pass
+        shutil.rmtree(_snapshot_dir(path, version, cache_dir), ignore_errors=True)
+
+
+def _sheet_file_name(index, sheet_name):
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', sheet_name).strip('_').lower()
+    return f"{index:02d}_{slug}.parquet"
+
+
+def _snapshot_dir(path, version, cache_dir):
+    return os.path.join(cache_dir, f"{_path_key(path)}-{version[:16]}-v{SNAPSHOT_FORMAT}")
+
+
+def _read_snapshot(snapshot_dir):
+    manifest = _read_json(os.path.join(snapshot_dir, 'manifest.json'))
+    if manifest is None:
+        return None
+    try:
+        return {
+            sheet['name']: pd.read_parquet(os.path.join(snapshot_dir, sheet['file']))
+            for sheet in manifest['sheets']
+        }
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _write_snapshot(snapshot_dir, sheets, version):
+    # Build the snapshot in a scratch directory and rename it into place atomically
+    parent = os.path.dirname(snapshot_dir)
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix='.tmp-')
+    try:
+        manifest = {'version': version, 'sheets': []}
+        for index, (sheet_name, sheet_df) in enumerate(sheets.items()):
+            file_name = _sheet_file_name(index, sheet_name)
+            sheet_df.to_parquet(os.path.join(tmp_dir, file_name), index=False)
+            manifest['sheets'].append({'name': sheet_name, 'file': file_name})
+        _write_json(os.path.join(tmp_dir, 'manifest.json'), manifest)
+        os.replace(tmp_dir, snapshot_dir)
+    except (OSError, ValueError, pyarrow.ArrowException):
+        # Another process won the race, the disk is read-only or a column holds values Parquet cannot
+        # store (e.g. a mix of numbers and text); the snapshot is only a cache, the parsed data is usable
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _prune_snapshots(path, snapshot_dir):
+    # Drop snapshots left behind by older versions of the same workbook. Those of pinned versions stay:
+    # a published data version may still read them, and _prune_pinned removes them with the copy
+    parent = os.path.dirname(snapshot_dir)
+    prefix = f"{_path_key(path)}-"
+    kept = {snapshot_dir}
+    kept.update(_snapshot_dir(path, version, parent) for _, version, _ in _pinned_versions(path, parent))
+    for entry in os.listdir(parent):
+        entry_path = os.path.join(parent, entry)
+        if entry_path not in kept and entry.startswith(prefix) and os.path.isdir(entry_path):
+            shutil.rmtree(entry_path, ignore_errors=True)
+
+
+def compact_roster(roster):
+    """Apply the roster schema and add the phone-prefix columns (idempotent)."""
+    roster = roster.copy()
+    if 'Student ID' in roster:
+        roster['Student ID'] = pd.to_numeric(roster['Student ID'], downcast='integer')
+    for col, kind in ROSTER_SCHEMA.items():
+        if col not in roster:
+            continue
+        if kind == 'label':
+            if isinstance(roster[col].dtype, pd.CategoricalDtype):
+                continue
+            # Only plain object columns need the (costly) distinct count; strings stay strings
+            repeats = not isinstance(roster[col].dtype, pd.StringDtype) and roster[col].nunique() * 2 < len(roster)
+            kind = 'category' if repeats else 'text'
+        dtype = TEXT_DTYPE if kind == 'text' else kind
+        if roster[col].dtype != dtype:
+            roster[col] = roster[col].astype(dtype)
+    for col, prefix_col in PHONE_PREFIX_COLUMNS.items():
+        if col in roster and prefix_col not in roster:
+            roster[prefix_col] = roster[col].astype(str).str[:PHONE_PREFIX_DIGITS].astype('category')
+    return roster
+
+
+def compact_scores(sheet):
+    """Downcast a score sheet: int8 for complete integer columns, float32 otherwise."""
+    sheet = sheet.copy()
+    for col in sheet.columns:
+        if col == 'Student ID':
+            sheet[col] = pd.to_numeric(sheet[col], downcast='integer')
+            continue
+        if sheet[col].dtype in (np.int8, np.float32):
+            continue
+        values = pd.to_numeric(sheet[col], errors='coerce')
+        if values.isna().all() and sheet[col].notna().any():
+            # Not a score column (e.g. a remarks column); leave it alone
+            continue
+        array = values.to_numpy(dtype='float64')
+        if (not values.isna().any() and (array == np.round(array)).all()
+                and array.min(initial=0) >= -INT8_MAX - 1 and array.max(initial=0) <= INT8_MAX):
+            sheet[col] = values.astype('int8')
+        else:
+            sheet[col] = values.astype('float32')
+    return sheet
+
+
+def compact_sheet(sheet_name, sheet):
+    if sheet_name == STUDENT_INFO_SHEET:
+        return compact_roster(sheet)
+    return compact_scores(sheet)
+
+
+def compact_sheets(sheets):
+    return {sheet_name: compact_sheet(sheet_name, sheet) for sheet_name, sheet in sheets.items()}
+
+
+def read_workbook(path=WORKBOOK_PATH):
+    """Parse every sheet of the workbook in a single pass."""
+    return pd.read_excel(path, sheet_name=None)
+
+
+def load_workbook(path=WORKBOOK_PATH, cache_dir=CACHE_DIR, version=None):
+    """Load all sheets in their compact schema, from the columnar cache when the workbook is unchanged.
+
+    With a ``version`` returned by pin_workbook, the sheets of that version are loaded (from its pinned
+    copy on a cache miss), whatever has happened to the workbook since.
+    """
+    source = path if version is None else _pinned_path(path, version, cache_dir)
+    if not HAS_PYARROW:
+        return compact_sheets(read_workbook(source))
+
+    if version is None:
+        version = workbook_version(path, cache_dir)
+    snapshot_dir = _snapshot_dir(path, version, cache_dir)
+    sheets = _read_snapshot(snapshot_dir)
+    if sheets is not None:
+        # Parquet brings Arrow strings back as Python strings, so the schema is re-applied
+        return compact_sheets(sheets)
+
+    sheets = compact_sheets(read_workbook(source))
+    _write_snapshot(snapshot_dir, sheets, version)
+    _prune_snapshots(path, snapshot_dir)
+    return sheets
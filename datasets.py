@@ -0,0 +1,172 @@
+import glob
+import hashlib
+import multiprocessing
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import analytics
+import data_loader
+import ingest
+
+# One workbook per class: <root>/<school>/<class>.xlsx, or <root>/<class>.xlsx for a single school
+Shard = namedtuple('Shard', ['key', 'path', 'school', 'class_name'])
+
+# Worker processes used to load changed shards; None lets the pool pick one per CPU
+MAX_WORKERS = int(os.environ['STUDENT_DATA_WORKERS']) if os.environ.get('STUDENT_DATA_WORKERS') else None
+
+
+def is_sharded(path):
+    return os.path.isdir(path)
+
+
+def discover_shards(root):
+    """Find the per-class workbooks under a dataset directory."""
+    shards = []
+    default_school = os.path.basename(os.path.abspath(root))
+    for path in sorted(glob.glob(os.path.join(root, '**', '*.xlsx'), recursive=True)):
+        if os.path.basename(path).startswith('~$'):
+            # Lock files Excel leaves next to open workbooks
+            continue
+        parts = os.path.relpath(path, root).split(os.sep)
+        school = parts[0] if len(parts) > 1 else default_school
+        class_name = os.path.splitext(parts[-1])[0]
+        shards.append(Shard('/'.join(parts), path, school, class_name))
+    return shards
+
+
+def load_shard(shard, test_max_scores=analytics.TEST_MAX_SCORES, subject_cols=analytics.SUBJECT_COLS):
+    """Load one class workbook and reduce it to mergeable partial aggregates (runs in a worker process)."""
+    sheets = data_loader.load_workbook(shard.path)
+    roster = sheets[data_loader.STUDENT_INFO_SHEET].assign(School=shard.school, Class=shard.class_name)
+
+    test_sheets = {name: sheets.get(name) for name in test_max_scores}
+    scores = ingest.ScoreAccumulator(test_max_scores, subject_cols)
+    for test_name, sheet in test_sheets.items():
+        if sheet is not None:
+            sheet = analytics.with_unassessed_subjects(test_name, sheet, subject_cols)
+            scores.add_chunk(test_name, analytics.clean_score_sheet(sheet, subject_cols))
+
+    return {
+        'roster': roster,
+        'scores': scores,
+        'facts': analytics.build_score_facts(test_sheets, test_max_scores, subject_cols),
+    }
+
+
+class DatasetVersion:
+    """The shards of one dataset version and their loaded partials; never modified once built."""
+
+    def __init__(self, version, shards, loaded):
+        self.version = version
+        self.shards = shards
+        self._loaded = loaded
+
+    def schools(self):
+        return sorted({shard.school for shard in self.shards})
+
+    def classes(self, schools=None):
+        return sorted({shard.class_name for shard in self.shards if not schools or shard.school in schools})
+
+    def select(self, schools=None, classes=None):
+        """Keys of the shards in the given schools and classes (empty filters match everything)."""
+        return tuple(
+            shard.key for shard in self.shards
+            if (not schools or shard.school in schools) and (not classes or shard.class_name in classes)
+        )
+
+    def _partials(self, keys):
+        keys = [key for key in keys if key in self._loaded]
+        # Partials are keyed by Student ID alone, so an ID used in two classes would merge two students
+        ids = pd.concat([
+            pd.Series(key, index=pd.unique(self._loaded[key][1]['roster']['Student ID'])) for key in keys
+        ]) if keys else pd.Series(dtype=object)
+        shared = ids[ids.index.duplicated(keep=False)]
+        if len(shared):
+            examples = ', '.join(str(student_id) for student_id in shared.index.unique()[:5])
+            raise ValueError(
+                f"Student IDs must be unique across classes; {examples} appear in "
+                f"{', '.join(sorted(shared.unique()))}"
+            )
+        return [self._loaded[key][1] for key in keys]
+
+    def roster(self, keys):
+        rosters = [partial['roster'] for partial in self._partials(keys)]
+        if not rosters:
+            return data_loader.compact_roster(pd.DataFrame(columns=[
+                'Student ID', 'Name', 'Email', 'Phone Number', 'Parent Phone Number', 'School', 'Class'
+            ]))
+        # Categories differ between shards, so the combined roster is compacted again
+        return data_loader.compact_roster(pd.concat(rosters, ignore_index=True))
+
+    def facts(self, keys):
+        facts = [partial['facts'] for partial in self._partials(keys)]
+        if not facts:
+            return analytics.build_score_facts({})
+        return pd.concat(facts, ignore_index=True)
+
+    def aggregates(self, keys):
+        """Dashboard aggregates for the selected shards, merged from their partial sums."""
+        partials = self._partials(keys)
+        combined = ingest.ScoreAccumulator()
+        for partial in partials:
+            combined.merge(partial['scores'])
+        return combined.aggregates(self.roster(keys))
+
+
+class ShardedDataset:
+    """A directory of per-class workbooks, loaded in parallel and combined from per-shard partials.
+
+    Each refresh that finds changes builds a new DatasetVersion next to the previous ones rather than
+    modifying them, so a reader of an earlier version (see ``at``) keeps getting that version's data.
+    """
+
+    def __init__(self, root, max_workers=MAX_WORKERS, keep=data_loader.KEEP_VERSIONS):
+        self.root = root
+        self.max_workers = max_workers
+        self.keep = keep
+        self._current = DatasetVersion(None, [], {})
+        # Replaced, never modified, so readers need no lock
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Pick up added, removed and changed workbooks; only changed ones are reloaded."""
+        with self._lock:
+            current = self._current
+            shards = discover_shards(self.root)
+            versions = {shard.key: data_loader.workbook_version(shard.path) for shard in shards}
+            loaded = current._loaded
+            stale = [shard for shard in shards if loaded.get(shard.key, (None,))[0] != versions[shard.key]]
+
+            if len(stale) > 1:
+                # Spawned rather than forked workers: the Streamlit server process is multi-threaded
+                context = multiprocessing.get_context('spawn')
+                with ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context) as pool:
+                    partials = list(pool.map(load_shard, stale))
+            else:
+                partials = [load_shard(shard) for shard in stale]
+
+            # Unchanged shards share their partials with the previous version
+            loaded = {shard.key: loaded[shard.key] for shard in shards if shard.key in loaded}
+            for shard, partial in zip(stale, partials):
+                loaded[shard.key] = (versions[shard.key], partial)
+
+            version = hashlib.sha256(
+                '\n'.join(f"{key}:{versions[key]}" for key in sorted(versions)).encode()
+            ).hexdigest()
+            if version != current.version:
+                self._current = DatasetVersion(version, shards, loaded)
+                kept = [(key, view) for key, view in self._versions.items() if key != version]
+                self._versions = dict(kept[max(len(kept) - self.keep + 1, 0):] + [(version, self._current)])
+            return version
+
+    def at(self, version):
+        """The data of a version returned by refresh(), while it is one of the last ``keep`` versions."""
+        view = self._versions.get(version)
+        if view is None:
+            raise KeyError(f"Data version {version[:12]} is no longer loaded")
+        return view
@@ -0,0 +1,277 @@
+import hashlib
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook as open_workbook
+
+import analytics
+
+# Rows held in memory at once while streaming a score sheet
+CHUNK_ROWS = 50_000
+
+# Per-student partial sums are merged after this many chunks to keep them bounded
+COMPACT_EVERY = 8
+
+# Workbooks larger than this are aggregated by streaming instead of being loaded whole
+STREAMING_THRESHOLD_BYTES = int(os.environ.get('STUDENT_DATA_STREAMING_BYTES', 50 * 1024 * 1024))
+
+
+def should_stream(path):
+    return os.path.getsize(path) > STREAMING_THRESHOLD_BYTES
+
+
+def sheet_names(path):
+    """Names of a workbook's sheets, read without parsing any of them."""
+    workbook = open_workbook(path, read_only=True)
+    try:
+        return workbook.sheetnames
+    finally:
+        workbook.close()
+
+
+def iter_sheet_chunks(path, sheet_name=None, chunk_rows=CHUNK_ROWS):
+    """Yield a sheet (or a CSV file) as DataFrames of at most ``chunk_rows`` rows."""
+    if path.lower().endswith('.csv'):
+        yield from pd.read_csv(path, chunksize=chunk_rows)
+        return
+
+    # Read-only mode parses the sheet lazily instead of building the whole worksheet in memory
+    workbook = open_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook[sheet_name].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(name) if name is not None else f"Unnamed: {i}" for i, name in enumerate(header)]
+
+        batch = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            batch.append(row)
+            if len(batch) >= chunk_rows:
+                yield pd.DataFrame.from_records(batch, columns=columns)
+                batch = []
+        if batch:
+            yield pd.DataFrame.from_records(batch, columns=columns)
+    finally:
+        workbook.close()
+
+
+def read_sheet(path, sheet_name=None, chunk_rows=CHUNK_ROWS):
+    """Read a whole sheet through the streaming reader."""
+    chunks = list(iter_sheet_chunks(path, sheet_name, chunk_rows))
+    if not chunks:
+        return pd.DataFrame()
+    return pd.concat(chunks, ignore_index=True)
+
+
+def _compact(parts):
+    # Fold every partial into one frame of per-student sums and counts
+    if not parts or (len(parts) == 1 and parts[0].index.is_unique):
+        return parts
+    return [pd.concat(parts).groupby(level=0).sum()]
+
+
+def _category_columns(frame, labels, name):
+    frame.index.name = 'Student ID'
+    frame.columns = pd.CategoricalIndex(labels, categories=labels, ordered=name == 'Test', name=name)
+    return frame
+
+
+class ScoreAccumulator:
+    """Running sums and counts, partitioned by test, from which the dashboard aggregates are derived."""
+
+    def __init__(self, test_max_scores=analytics.TEST_MAX_SCORES, subject_cols=analytics.SUBJECT_COLS):
+        self.test_names = list(test_max_scores)
+        self.subject_cols = list(subject_cols)
+        self._max_scores = np.array([test_max_scores[name] for name in self.test_names], dtype='float64')
+
+        # (test x subject) cells, and per test a list of per-student partial sums and counts by subject
+        self._cell_sums = np.zeros((len(self.test_names), len(self.subject_cols)))
+        self._cell_counts = np.zeros((len(self.test_names), len(self.subject_cols)), dtype='int64')
+        self._student_parts = {test_name: [] for test_name in self.test_names}
+
+    def reset_test(self, test_name):
+        """Forget everything folded in for one test."""
+        test_pos = self.test_names.index(test_name)
+        self._cell_sums[test_pos] = 0
+        self._cell_counts[test_pos] = 0
+        self._student_parts[test_name] = []
+
+    def merge(self, other):
+        """Add another accumulator's totals (e.g. from another class) into this one."""
+        self._cell_sums += other._cell_sums
+        self._cell_counts += other._cell_counts
+        for test_name in self.test_names:
+            self._student_parts[test_name] = self._student_parts[test_name] + other._student_parts[test_name]
+        return self
+
+    def add_chunk(self, test_name, chunk):
+        """Fold one cleaned chunk of a test sheet into the running totals."""
+        test_pos = self.test_names.index(test_name)
+        scores = chunk[self.subject_cols].to_numpy(dtype='float64')
+        present = ~np.isnan(scores)
+        percents = scores / self._max_scores[test_pos] * 100
+
+        self._cell_sums[test_pos] += np.nansum(scores, axis=0)
+        self._cell_counts[test_pos] += present.sum(axis=0)
+
+        parts = self._student_parts[test_name]
+        parts.append(pd.DataFrame(
+            np.hstack([np.where(present, percents, 0), present]),
+            index=chunk['Student ID'].to_numpy(),
+            columns=pd.MultiIndex.from_product([['sum', 'count'], self.subject_cols])
+        ))
+        if len(parts) >= COMPACT_EVERY:
+            self._student_parts[test_name] = _compact(parts)
+
+    def aggregates(self, student_info):
+        """The same aggregates as analytics.build_aggregates, from the accumulated totals."""
+        tests = pd.CategoricalIndex(self.test_names, categories=self.test_names, ordered=True, name='Test')
+        subjects = pd.CategoricalIndex(self.subject_cols, categories=self.subject_cols, name='Subject')
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cell_means = self._cell_sums / self._cell_counts
+            test_means = self._cell_sums.sum(axis=1) / self._cell_counts.sum(axis=1)
+
+        test = pd.DataFrame({
+            'Score': test_means,
+            'Percent': test_means / self._max_scores * 100
+        }, index=tests)
+        test_subject = pd.DataFrame({
+            'Score': cell_means.ravel(),
+            'Percent': (cell_means / self._max_scores[:, None] * 100).ravel()
+        }, index=pd.MultiIndex.from_product([tests, subjects]))
+
+        # Per-student totals: a test's subjects add up to the (student x test) cell,
+        # and the same subject across tests adds up to the (student x subject) cell
+        test_sums, test_counts, subject_sums, subject_counts = {}, {}, [], []
+        for test_name in self.test_names:
+            self._student_parts[test_name] = _compact(self._student_parts[test_name])
+            if not self._student_parts[test_name]:
+                continue
+            totals = self._student_parts[test_name][0]
+            test_sums[test_name] = totals['sum'].sum(axis=1)
+            test_counts[test_name] = totals['count'].sum(axis=1)
+            subject_sums.append(totals['sum'])
+            subject_counts.append(totals['count'])
+
+        student_test = pd.DataFrame(test_sums).reindex(columns=self.test_names)
+        student_test = student_test / pd.DataFrame(test_counts).reindex(columns=self.test_names).where(lambda c: c > 0)
+        if subject_sums:
+            student_subject = pd.concat(subject_sums).groupby(level=0).sum()
+            student_subject = student_subject / pd.concat(subject_counts).groupby(level=0).sum().where(lambda c: c > 0)
+        else:
+            student_subject = pd.DataFrame(columns=self.subject_cols)
+
+        return analytics.assemble_aggregates(
+            test,
+            test_subject,
+            _category_columns(student_test.sort_index(), self.test_names, 'Test'),
+            _category_columns(student_subject.reindex(columns=self.subject_cols), self.subject_cols, 'Subject'),
+            student_info
+        )
+
+
+class IncrementalAggregates:
+    """Keeps the aggregates of a changing workbook up to date by refolding only the sheets that changed.
+
+    A sheet whose previous rows are untouched only has its new rows folded in; any other edit
+    rebuilds that test's partition. Unchanged tests are never touched.
+    """
+
+    def __init__(self, test_max_scores=analytics.TEST_MAX_SCORES, subject_cols=analytics.SUBJECT_COLS,
+                 test_subjects=analytics.TEST_SUBJECTS):
+        self.subject_cols = list(subject_cols)
+        self.test_subjects = dict(test_subjects)
+        self._accumulator = ScoreAccumulator(test_max_scores, subject_cols)
+        self._sheet_state = {}
+        self._info_digest = None
+        self._aggregates = None
+        self._lock = threading.Lock()
+
+    def _refresh_test(self, test_name, sheet):
+        # Returns True when the test's partition had to change
+        state = self._sheet_state.get(test_name)
+        if sheet is None:
+            if state is None:
+                return False
+            self._accumulator.reset_test(test_name)
+            del self._sheet_state[test_name]
+            return True
+
+        sheet = analytics.with_unassessed_subjects(test_name, sheet, self.subject_cols, self.test_subjects)
+        row_hashes = pd.util.hash_pandas_object(sheet, index=False).to_numpy()
+        digest = _digest(row_hashes)
+        if state is not None and state['digest'] == digest:
+            return False
+
+        if state is not None and state['rows'] < len(sheet) and _digest(row_hashes[:state['rows']]) == state['digest']:
+            # Rows were only appended: fold in the new ones
+            self._accumulator.add_chunk(
+                test_name, analytics.clean_score_sheet(sheet.iloc[state['rows']:], self.subject_cols))
+        else:
+            self._accumulator.reset_test(test_name)
+            self._accumulator.add_chunk(test_name, analytics.clean_score_sheet(sheet, self.subject_cols))
+        self._sheet_state[test_name] = {'rows': len(sheet), 'digest': digest}
+        return True
+
+    def update(self, test_sheets, student_info):
+        """Bring the aggregates in line with the given sheets and return them."""
+        with self._lock:
+            changed = [
+                test_name for test_name in self._accumulator.test_names
+                if self._refresh_test(test_name, test_sheets.get(test_name))
+            ]
+            info_digest = _digest(pd.util.hash_pandas_object(student_info, index=False).to_numpy())
+            if changed or info_digest != self._info_digest or self._aggregates is None:
+                self._aggregates = self._accumulator.aggregates(student_info)
+                self._info_digest = info_digest
+            return self._aggregates
+
+
+def _digest(row_hashes):
+    return hashlib.sha1(row_hashes.tobytes()).hexdigest()
+
+
+def stream_aggregates(source, student_info, test_max_scores=analytics.TEST_MAX_SCORES,
+                      subject_cols=analytics.SUBJECT_COLS, test_subjects=analytics.TEST_SUBJECTS,
+                      chunk_rows=CHUNK_ROWS):
+    """Aggregate score sheets chunk by chunk, so peak memory depends on the chunk size, not the file size.
+
+    ``source`` is either a workbook with one sheet per test or a dict mapping test names to CSV files.
+    """
+    if isinstance(source, dict):
+        sheets = [(test_name, source[test_name], None) for test_name in test_max_scores if test_name in source]
+    else:
+        # Tests registered ahead of their sheet are skipped, as on the in-memory path
+        present = sheet_names(source)
+        sheets = [(test_name, source, test_name) for test_name in test_max_scores if test_name in present]
+
+    accumulator = ScoreAccumulator(test_max_scores, subject_cols)
+    for test_name, path, sheet_name in sheets:
+        for chunk in iter_sheet_chunks(path, sheet_name, chunk_rows):
+            chunk = analytics.with_unassessed_subjects(test_name, chunk, subject_cols, test_subjects)
+            accumulator.add_chunk(test_name, analytics.clean_score_sheet(chunk, subject_cols))
+    return accumulator.aggregates(student_info)
+
+
+def stream_score_facts(source, test_max_scores=analytics.TEST_MAX_SCORES, subject_cols=analytics.SUBJECT_COLS,
+                       test_subjects=analytics.TEST_SUBJECTS, chunk_rows=CHUNK_ROWS):
+    """Build the fact table of a workbook's score sheets chunk by chunk (see stream_aggregates).
+
+    Only a chunk of a raw sheet is held at a time. The fact table itself is kept whole, in its compact
+    dtypes, since Student Details, Trends and report exports need every score.
+    """
+    present = sheet_names(source)
+    parts = [
+        analytics.build_score_facts({test_name: chunk}, test_max_scores, subject_cols, test_subjects)
+        for test_name in test_max_scores if test_name in present
+        for chunk in iter_sheet_chunks(source, test_name, chunk_rows)
+    ]
+    if not parts:
+        return analytics.build_score_facts({}, test_max_scores, subject_cols)
+    return pd.concat(parts, ignore_index=True)
@@ -0,0 +1,155 @@
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak memory is then left out
+    resource = None
+
+# Set to 1 to show the profiling panel in the sidebar
+ADMIN_PANEL = os.environ.get('STUDENT_DASHBOARD_ADMIN') == '1'
+
+# Per-rerun profiles are appended to this file as JSON lines when set
+PROFILE_LOG_PATH = os.environ.get('STUDENT_DASHBOARD_PROFILE_LOG')
+
+logger = logging.getLogger('student_dashboard.profile')
+
+# Each Streamlit session runs its script in its own thread, so the active profile is per thread
+_current = threading.local()
+
+
+def peak_memory_mb():
+    """Peak resident memory of this process in MB, or None where it cannot be read."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+
+
+class RerunProfile:
+    """Stage timings and cache hit/miss counts collected over one run of the script."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings = []
+        self.cache_calls = {}
+        self.cache_misses = {}
+        self._stack = []
+        self._section = None
+
+    def begin_section(self, name):
+        # Everything from here to the end of the run is timed as one section (e.g. the selected page)
+        self._stack.append(name)
+        self._section = (name, time.perf_counter())
+
+    @contextmanager
+    def stage(self, name):
+        # Nested stages are reported as "Page / Section / Chart"
+        self._stack.append(name)
+        path = ' / '.join(self._stack)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings.append((path, (time.perf_counter() - start) * 1000))
+            self._stack.pop()
+
+    def cache_stats(self):
+        return {
+            name: {'hits': calls - self.cache_misses.get(name, 0), 'misses': self.cache_misses.get(name, 0)}
+            for name, calls in self.cache_calls.items()
+        }
+
+    def summary(self):
+        if self._section is not None:
+            name, start = self._section
+            self.timings.append((name, (time.perf_counter() - start) * 1000))
+            self._section = None
+        return {
+            'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'total_ms': round((time.perf_counter() - self.started) * 1000, 2),
+            'stages': [{'stage': path, 'ms': round(ms, 2)} for path, ms in self.timings],
+            'cache': self.cache_stats(),
+            'peak_memory_mb': peak_memory_mb(),
+        }
+
+
+def start_rerun():
+    """Begin a fresh profile for the current script run."""
+    _current.profile = RerunProfile()
+    return _current.profile
+
+
+def current():
+    return getattr(_current, 'profile', None)
+
+
+def section(name):
+    profile = current()
+    if profile is not None:
+        profile.begin_section(name)
+
+
+@contextmanager
+def stage(name):
+    """Time a block under the current profile; a no-op outside a profiled run."""
+    profile = current()
+    if profile is None:
+        yield
+        return
+    with profile.stage(name):
+        yield
+
+
+def counted(cache_decorator):
+    """Apply a Streamlit cache decorator and count its hits and misses in the current profile.
+
+    The inner wrapper only runs when the cache misses, the outer one on every call.
+    """
+    def decorate(func):
+        name = func.__name__
+
+        @functools.wraps(func)
+        def on_miss(*args, **kwargs):
+            profile = current()
+            if profile is not None:
+                profile.cache_misses[name] = profile.cache_misses.get(name, 0) + 1
+            return func(*args, **kwargs)
+
+        cached = cache_decorator(on_miss)
+
+        @functools.wraps(func)
+        def call(*args, **kwargs):
+            profile = current()
+            if profile is not None:
+                profile.cache_calls[name] = profile.cache_calls.get(name, 0) + 1
+            return cached(*args, **kwargs)
+
+        call.clear = cached.clear
+        return call
+    return decorate
+
+
+def finish_rerun():
+    """Close the current profile, log it and return its summary."""
+    profile = current()
+    if profile is None:
+        return None
+    _current.profile = None
+    summary = profile.summary()
+
+    line = json.dumps(summary)
+    logger.debug(line)
+    if PROFILE_LOG_PATH:
+        with open(PROFILE_LOG_PATH, 'a') as f:
+            f.write(line + '\n')
+    return summary
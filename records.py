@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+import analytics
+
+
+class StudentRecordStore:
+    """Constant-time access to a student's roster details and scores, keyed by Student ID."""
+
+    def __init__(self, student_info, facts, test_max_scores=analytics.TEST_MAX_SCORES,
+                 subject_cols=analytics.SUBJECT_COLS):
+        self.test_names = list(test_max_scores)
+        self.subject_cols = list(subject_cols)
+        self._max_scores = np.array([test_max_scores[name] for name in self.test_names], dtype=np.float32)
+
+        # First row wins if the roster repeats an ID
+        info = student_info.drop_duplicates('Student ID')
+        self._columns = list(info.columns)
+        self._rows = info.to_numpy(dtype=object)
+        self._positions = {student_id: i for i, student_id in enumerate(info['Student ID'].tolist())}
+
+        # Dense (students x tests x subjects) score cube, NaN where a score is missing
+        self._scores = np.full((len(info), len(self.test_names), len(self.subject_cols)), np.nan, dtype=np.float32)
+        student_pos = pd.Index(info['Student ID']).get_indexer(facts['Student ID'])
+        test_pos = pd.Index(self.test_names).get_indexer(facts['Test'].astype(object))
+        subject_pos = pd.Index(self.subject_cols).get_indexer(facts['Subject'].astype(object))
+        known = (student_pos >= 0) & (test_pos >= 0) & (subject_pos >= 0)
+        self._scores[student_pos[known], test_pos[known], subject_pos[known]] = facts['Score'].to_numpy()[known]
+
+    def __contains__(self, student_id):
+        return student_id in self._positions
+
+    def __len__(self):
+        return len(self._positions)
+
+    def get(self, student_id):
+        """Roster details of a student as a dict, or None for an unknown ID."""
+        pos = self._positions.get(student_id)
+        if pos is None:
+            return None
+        return dict(zip(self._columns, self._rows[pos]))
+
+    def scores(self, student_id):
+        """Raw scores of a student, one row per test and one column per subject."""
+        pos = self._positions.get(student_id)
+        if pos is None:
+            return None
+        return pd.DataFrame(self._scores[pos], index=self.test_names, columns=self.subject_cols)
+
+    def details_block(self, start, stop):
+        """Roster details of the students at positions [start, stop), as dicts."""
+        return [dict(zip(self._columns, row)) for row in self._rows[start:stop]]
+
+    def score_block(self, start, stop):
+        """Score cube slice (students x tests x subjects) for the students at positions [start, stop)."""
+        return self._scores[start:stop]
+
+    def report_card(self, student_id):
+        """Scores for every test together with the maximum score and the percentage obtained."""
+        card = self.scores(student_id)
+        if card is None:
+            return None
+        card["Max Score"] = self._max_scores
+        card["Percent"] = card[self.subject_cols].mean(axis=1) / card["Max Score"] * 100
+        card.index.name = "Test"
+        return card
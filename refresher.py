@@ -0,0 +1,76 @@
+"""Background refresh of the data source: changes are detected and rebuilt off the request path.
+
+Requests read the latest published snapshot. A new snapshot is only published, in a single reference
+swap, once everything in it has been built, so a request never sees a half-built data version. The data
+behind a version never changes either: the workbook is pinned as a copy per version, and the sharded and
+SQLite backends keep each version's state apart (see ``at``), so requests that began on the previous
+version finish on it.
+"""
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+
+logger = logging.getLogger('student_dashboard.refresher')
+
+# Seconds between checks of the data source for changes; 0 turns background refresh off
+REFRESH_SECONDS = float(os.environ.get('STUDENT_REFRESH_SECONDS', 10))
+
+# A published data version and when it was built; never modified after it is published
+Snapshot = namedtuple('Snapshot', ['version', 'built_at'])
+
+
+class BackgroundRefresher:
+    """Polls ``version_fn`` on a daemon thread and publishes every new version once ``build_fn(version)`` ran."""
+
+    def __init__(self, version_fn, build_fn, interval=REFRESH_SECONDS):
+        self.version_fn = version_fn
+        self.build_fn = build_fn
+        self.interval = interval
+        self._snapshot = None
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def snapshot(self):
+        """The latest complete snapshot (a plain attribute read, so it is never torn)."""
+        return self._snapshot
+
+    def refresh(self):
+        """Check the source once and, when its version changed, build and publish a new snapshot.
+
+        Returns True when a new snapshot was published. Build errors keep the previous snapshot.
+        """
+        with self._refresh_lock:
+            version = self.version_fn()
+            current = self._snapshot
+            if current is not None and current.version == version:
+                return False
+            self.build_fn(version)
+            self._snapshot = Snapshot(version, time.time())
+            logger.info("Published data version %s", version[:12])
+            return True
+
+    def start(self):
+        """Build the first snapshot in the caller's thread, then keep refreshing in the background."""
+        if self._snapshot is None:
+            self.refresh()
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name='data-refresher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception:
+                # A workbook caught mid-save, say; the current snapshot stays up and the next poll retries
+                logger.exception("Background data refresh failed")
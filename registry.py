@@ -0,0 +1,127 @@
+"""The test registry: every test with its maximum score, subjects and position in the term.
+
+The registry comes from the first of these that exists:
+
+1. a "Tests" sheet in the workbook (columns Test, Max Score and optionally Order and Subjects),
+2. the JSON file named by STUDENT_TEST_REGISTRY (default tests.json),
+3. the built-in defaults below.
+
+It is read with every data version of a workbook, from that version's pinned copy, so tests added to the
+Tests sheet appear with the data that adds them. Directory datasets read the config file (or the
+defaults) once, at startup.
+"""
+import json
+import os
+
+from openpyxl import load_workbook as open_workbook
+
+REGISTRY_PATH = os.environ.get('STUDENT_TEST_REGISTRY', 'tests.json')
+
+# Optional sheet in the workbook that lists the tests
+METADATA_SHEET = 'Tests'
+
+DEFAULT_SUBJECTS = ["English Score", "Maths Score", "Science Score", "SST Score", "Hindi", "Marathi"]
+
+DEFAULT_TESTS = [
+    {"name": "Test 1", "max_score": 20},
+    {"name": "Surprise Test", "max_score": 20},
+    {"name": "Test 2", "max_score": 20},
+    {"name": "Unit Test", "max_score": 50},
+]
+
+
+def _split_subjects(value):
+    if value is None or str(value).strip() == "":
+        return None
+    return [subject.strip() for subject in str(value).split(",") if subject.strip()]
+
+
+def normalize(tests, subjects=None):
+    """Tests in term order, each with a name, max score and subject list (the shared subjects by default)."""
+    subjects = list(subjects or DEFAULT_SUBJECTS)
+    normalized = []
+    for position, test in enumerate(tests):
+        name = str(test["name"]).strip()
+        max_score = float(test["max_score"])
+        if max_score <= 0:
+            raise ValueError(f"Test {name!r} needs a positive maximum score")
+        normalized.append({
+            "name": name,
+            "max_score": int(max_score) if max_score.is_integer() else max_score,
+            "subjects": list(test.get("subjects") or subjects),
+            "order": test["order"] if test.get("order") is not None else position,
+        })
+
+    names = [test["name"] for test in normalized]
+    if len(set(names)) != len(names):
+        raise ValueError("Test names in the registry must be unique")
+    # Stable sort: tests without an explicit order keep their listed position
+    return sorted(normalized, key=lambda test: test["order"])
+
+
+def read_config(path=REGISTRY_PATH):
+    """Tests from a JSON registry file: {"subjects": [...], "tests": [{"name", "max_score", ...}]}."""
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
+    return normalize(config["tests"], config.get("subjects"))
+
+
+def read_metadata_sheet(workbook_path):
+    """Tests from the workbook's metadata sheet, or None when the workbook has no such sheet."""
+    workbook = open_workbook(workbook_path, read_only=True, data_only=True)
+    try:
+        if METADATA_SHEET not in workbook.sheetnames:
+            return None
+        rows = workbook[METADATA_SHEET].iter_rows(values_only=True)
+        header = [str(cell).strip() if cell is not None else "" for cell in next(rows, ())]
+        tests = []
+        for row in rows:
+            record = dict(zip(header, row))
+            if record.get("Test") is None:
+                continue
+            tests.append({
+                "name": record["Test"],
+                "max_score": record["Max Score"],
+                "order": record.get("Order"),
+                "subjects": _split_subjects(record.get("Subjects")),
+            })
+    finally:
+        workbook.close()
+    return normalize(tests) if tests else None
+
+
+def load_registry(workbook_path=None, config_path=REGISTRY_PATH):
+    """The registry for a workbook: its metadata sheet, else the config file, else the defaults."""
+    if workbook_path is not None and os.path.isfile(workbook_path) and workbook_path.endswith(('.xlsx', '.xlsm')):
+        tests = read_metadata_sheet(workbook_path)
+        if tests is not None:
+            return tests
+    if config_path and os.path.isfile(config_path):
+        return read_config(config_path)
+    return normalize(DEFAULT_TESTS)
+
+
+def test_max_scores(tests):
+    """Maximum score per test, in term order."""
+    return {test["name"]: test["max_score"] for test in tests}
+
+
+def subject_columns(tests):
+    """Every subject any test assesses, in order of first appearance."""
+    subjects = []
+    for test in tests:
+        subjects += [subject for subject in test["subjects"] if subject not in subjects]
+    return subjects
+
+
+def test_subjects(tests):
+    """Subjects assessed by each test."""
+    return {test["name"]: list(test["subjects"]) for test in tests}
+
+
+def max_score_summary(tests):
+    """Tests grouped by maximum score, e.g. "Test 1, Test 2: Maximum score of 20 points"."""
+    groups = {}
+    for test in tests:
+        groups.setdefault(test["max_score"], []).append(test["name"])
+    return [f"{', '.join(names)}: Maximum score of {max_score:g} points" for max_score, names in groups.items()]
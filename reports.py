@@ -0,0 +1,203 @@
+"""Per-student HTML report cards for a whole cohort, rendered in worker processes and streamed into a zip.
+
+    python -m reports --output report_cards.zip [--workbook StudentData.xlsx] [--school ...] [--class ...]
+"""
+import argparse
+import html
+import multiprocessing
+import os
+import re
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import analytics
+import data_loader
+import datasets
+import records
+import registry
+
+# Students rendered per task handed to a worker process
+BATCH_SIZE = 500
+
+# Cohorts up to this size are rendered in-process; a pool costs more than it saves
+POOL_THRESHOLD = 2_000
+
+# Rendered batches waiting to be written, per worker; bounds the memory held at any time
+BATCHES_IN_FLIGHT = 2
+
+PAGE_STYLE = """
+body { font-family: sans-serif; margin: 2em; }
+table { border-collapse: collapse; margin-top: 1em; }
+th, td { border: 1px solid #ccc; padding: 4px 10px; text-align: right; }
+th:first-child, td:first-child { text-align: left; }
+"""
+
+
+def _format(value, digits=None):
+    # Marks are printed as stored (17.5 stays 17.5); only derived values are rounded to ``digits``
+    # NaN is the only value that differs from itself
+    if value is None or value != value:
+        return "—"
+    if digits is None:
+        return f"{value:g}"
+    return f"{value:.{digits}f}"
+
+
+def _slug(text):
+    return re.sub(r'[^A-Za-z0-9]+', '_', str(text)).strip('_') or 'student'
+
+
+def report_path(details):
+    """Archive path of one report: <school>/<class>/<id>_<name>.html when the roster has classes."""
+    file_name = f"{details['Student ID']}_{_slug(details['Name'])}.html"
+    if details.get('Class') is not None:
+        return f"{_slug(details['School'])}/{_slug(details['Class'])}/{file_name}"
+    return file_name
+
+
+def test_results(scores, test_max_scores):
+    """Percentage and grade per test for a block of students (students x tests x subjects)."""
+    max_scores = np.array(list(test_max_scores.values()), dtype='float64')
+    taken = np.count_nonzero(~np.isnan(scores), axis=2)
+    totals = np.nansum(scores, axis=2, dtype='float64')
+    test_pct = np.divide(totals, taken, out=np.full(taken.shape, np.nan), where=taken > 0) / max_scores * 100
+    grades = analytics.assign_grades(test_pct.ravel())
+    grades = grades.astype(object).where(grades.notna(), "—").to_numpy().reshape(test_pct.shape)
+    return test_pct, grades
+
+
+def render_report(details, scores, test_pct, test_grades, overall, test_max_scores, subject_cols):
+    """One student's report card as a standalone HTML page."""
+    test_names = list(test_max_scores)
+    columns = ["Test"] + list(subject_cols) + ["Max Score", "Percent", "Grade"]
+    header = "".join(f"<th>{html.escape(col)}</th>" for col in columns)
+    rows = []
+    for i, test_name in enumerate(test_names):
+        cells = [html.escape(test_name)]
+        cells += [_format(score) for score in scores[i]]
+        cells += [_format(test_max_scores[test_name]), f"{_format(test_pct[i], 1)}%", html.escape(test_grades[i])]
+        rows.append("<tr>" + "".join(f"<td>{cell}</td>" for cell in cells) + "</tr>")
+
+    facts = [("Student ID", details["Student ID"]), ("Name", details["Name"]), ("Email", details.get("Email"))]
+    if details.get("Class") is not None:
+        facts.append(("Class", f"{details['School']} / {details['Class']}"))
+    facts.append(("Overall Average", f"{_format(overall['Overall Average (%)'], 1)}%"))
+    facts.append(("Grade", overall["Grade"]))
+    summary = "".join(f"<p><b>{label}:</b> {html.escape(str(value))}</p>" for label, value in facts)
+
+    title = html.escape(f"Report Card - {details['Name']}")
+    return (
+        f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>{title}</title>"
+        f"<style>{PAGE_STYLE}</style></head><body><h1>{title}</h1>{summary}"
+        f"<table><tr>{header}</tr>{''.join(rows)}</table></body></html>"
+    )
+
+
+def render_batch(batch):
+    """Render a batch of students (runs in a worker process) and return (path, encoded HTML) pairs."""
+    test_pct, test_grades = test_results(batch['scores'], batch['test_max_scores'])
+    return [
+        (report_path(details), render_report(details, scores, pct, grades, overall, batch['test_max_scores'],
+                                             batch['subject_cols']).encode('utf-8'))
+        for details, scores, pct, grades, overall
+        in zip(batch['details'], batch['scores'], test_pct, test_grades, batch['overall'])
+    ]
+
+
+def iter_batches(student_info, facts, aggregates, test_max_scores=analytics.TEST_MAX_SCORES,
+                 subject_cols=analytics.SUBJECT_COLS, batch_size=BATCH_SIZE):
+    """Split the cohort into self-contained batches of roster details, score blocks and overall results."""
+    store = records.StudentRecordStore(student_info, facts, test_max_scores, subject_cols)
+    overall = aggregates["student_overall"][["Overall Average (%)", "Grade"]]
+    overall = overall.assign(Grade=overall["Grade"].astype(object).where(overall["Grade"].notna(), "—"))
+
+    for start in range(0, len(store), batch_size):
+        stop = min(start + batch_size, len(store))
+        details = store.details_block(start, stop)
+        student_ids = [row["Student ID"] for row in details]
+        yield {
+            'test_max_scores': dict(test_max_scores),
+            'subject_cols': list(subject_cols),
+            'details': details,
+            'scores': store.score_block(start, stop),
+            'overall': overall.reindex(student_ids).to_dict('records'),
+        }
+
+
+def write_reports(target, student_info, facts, aggregates, max_workers=None, progress=None,
+                  test_max_scores=analytics.TEST_MAX_SCORES, subject_cols=analytics.SUBJECT_COLS):
+    """Render every student's report into a zip archive at ``target`` (a path or a binary file).
+
+    Batches are written as soon as they are rendered and only a few are in flight at once, so the
+    rendered output never has to fit in memory. Returns the number of reports written.
+    """
+    batches = iter_batches(student_info, facts, aggregates, test_max_scores, subject_cols)
+    # One report per Student ID: a repeated ID keeps its first roster row (see StudentRecordStore)
+    total = student_info['Student ID'].nunique(dropna=False)
+    written = 0
+
+    summary = aggregates["student_overall"].reset_index()
+    with zipfile.ZipFile(target, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('summary.csv', summary.to_csv(index=False))
+
+        def write(reports):
+            nonlocal written
+            for path, content in reports:
+                archive.writestr(path, content)
+            written += len(reports)
+            if progress is not None:
+                progress(written, total)
+
+        if total <= POOL_THRESHOLD:
+            for batch in batches:
+                write(render_batch(batch))
+            return written
+
+        # Spawned rather than forked workers: the Streamlit server process is multi-threaded
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as pool:
+            window = BATCHES_IN_FLIGHT * (max_workers or os.cpu_count() or 1)
+            pending = deque()
+            for batch in batches:
+                pending.append(pool.submit(render_batch, batch))
+                if len(pending) >= window:
+                    write(pending.popleft().result())
+            while pending:
+                write(pending.popleft().result())
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a report card for every student into a zip archive.")
+    parser.add_argument('--workbook', default=data_loader.WORKBOOK_PATH,
+                        help="workbook, or directory of per-class workbooks")
+    parser.add_argument('--output', default='report_cards.zip')
+    parser.add_argument('--school', action='append', help="only these schools (directory datasets)")
+    parser.add_argument('--class', dest='classes', action='append', help="only these classes (directory datasets)")
+    parser.add_argument('--workers', type=int, default=datasets.MAX_WORKERS)
+    args = parser.parse_args()
+
+    # Directory datasets use the registry of the config file (or the defaults), a workbook its own
+    tests = analytics.TESTS if datasets.is_sharded(args.workbook) else registry.load_registry(args.workbook)
+    test_max_scores, subject_cols = registry.test_max_scores(tests), registry.subject_columns(tests)
+    if datasets.is_sharded(args.workbook):
+        dataset = datasets.ShardedDataset(args.workbook, max_workers=args.workers)
+        view = dataset.at(dataset.refresh())
+        keys = view.select(args.school, args.classes)
+        student_info, facts, aggregates = view.roster(keys), view.facts(keys), view.aggregates(keys)
+    else:
+        sheets = data_loader.load_workbook(args.workbook)
+        student_info = sheets[data_loader.STUDENT_INFO_SHEET]
+        facts = analytics.build_score_facts(sheets, test_max_scores, subject_cols, registry.test_subjects(tests))
+        aggregates = analytics.build_aggregates(facts, student_info)
+
+    count = write_reports(args.output, student_info, facts, aggregates, max_workers=args.workers,
+                          test_max_scores=test_max_scores, subject_cols=subject_cols)
+    print(f"Wrote {count} report cards to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Rows per page of the roster table
+PAGE_SIZES = [25, 50, 100, 250]
+
+
+class RosterTable:
+    """Server-side sorting, filtering and paging over a roster; only the requested page is ever materialised.
+
+    Sort orders are computed once per column and direction and then reused, and every categorical
+    column is indexed by the row positions of each of its values, so a query is a few array operations
+    over positions rather than a sort or scan of the frame.
+    """
+
+    def __init__(self, df):
+        self._df = df
+        self.size = len(df)
+        self._orders = {}
+        self._lock = threading.Lock()
+
+        # Categorical columns: rows grouped by category code, with each code's slice bounds
+        self._postings = {}
+        for col in df.columns:
+            if isinstance(df[col].dtype, pd.CategoricalDtype):
+                codes = df[col].cat.codes.to_numpy()
+                order = np.argsort(codes, kind='stable')
+                bounds = np.searchsorted(codes[order], np.arange(len(df[col].cat.categories) + 1))
+                self._postings[col] = (df[col].cat.categories, order, bounds)
+
+    def filter_options(self, columns=None):
+        """Values each filterable (categorical) column can be filtered on."""
+        return {
+            col: [str(value) for value in categories]
+            for col, (categories, _, _) in self._postings.items()
+            if columns is None or col in columns
+        }
+
+    def sort_order(self, column, ascending=True):
+        """Row positions sorted by a column (stable, missing values last), computed once and reused."""
+        key = (column, ascending)
+        order = self._orders.get(key)
+        if order is None:
+            values = self._df[column].reset_index(drop=True)
+            order = values.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+            with self._lock:
+                self._orders[key] = order
+        return order
+
+    def _value_mask(self, column, values):
+        categories, order, bounds = self._postings[column]
+        mask = np.zeros(self.size, dtype=bool)
+        labels = [str(category) for category in categories]
+        for value in values:
+            if value in labels:
+                code = labels.index(value)
+                mask[order[bounds[code]:bounds[code + 1]]] = True
+        return mask
+
+    def query(self, positions=None, filters=(), sort_by=None, ascending=True):
+        """Positions of the rows that are in ``positions`` (all rows by default) and match every
+        (column, values) filter, in display order. An empty value list matches every row."""
+        mask = None
+        if positions is not None:
+            mask = np.zeros(self.size, dtype=bool)
+            mask[positions] = True
+        for column, values in filters:
+            if values:
+                value_mask = self._value_mask(column, values)
+                mask = value_mask if mask is None else mask & value_mask
+
+        if sort_by is None:
+            if mask is None:
+                return np.arange(self.size)
+            # Keep the caller's order (e.g. search relevance) when no sort is asked for
+            positions = np.arange(self.size) if positions is None else np.asarray(positions)
+            return positions[mask[positions]]
+
+        order = self.sort_order(sort_by, ascending)
+        return order if mask is None else order[mask[order]]
+
+    def page(self, rows, page=1, page_size=PAGE_SIZES[0]):
+        """The rows of one page as a DataFrame; nothing outside it is copied."""
+        start = (page - 1) * page_size
+        return self._df.iloc[rows[start:start + page_size]]
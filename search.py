@@ -0,0 +1,119 @@
+import numpy as np
+
+# Names are indexed by every 1, 2 and 3 character substring, so any query up to three
+# characters is answered straight from a posting list and longer ones by intersecting trigrams
+MAX_NGRAM = 3
+CODE_BASE = 0x110000
+
+# Refine the previous result set instead of the index only while it stays this small
+NARROW_LIMIT = 20_000
+
+
+class StudentSearchIndex:
+    """Case-insensitive name substring and Student ID prefix search over a roster."""
+
+    def __init__(self, df):
+        self.size = len(df)
+        names = df['Name'].fillna('').astype(str).str.lower()
+        self._names = names.to_numpy(dtype=object)
+
+        # Student IDs sorted as strings for prefix range lookups
+        id_strings = df['Student ID'].astype(str).to_numpy(dtype=str)
+        self._id_order = np.argsort(id_strings, kind='stable')
+        self._sorted_ids = id_strings[self._id_order]
+
+        self._build_postings(names)
+
+    def _build_postings(self, names):
+        # View the names as a (students x characters) matrix of code points and encode every
+        # n-gram as a single integer, so no per-gram Python strings are ever created
+        chars = names.to_numpy(dtype=str)
+        width = chars.dtype.itemsize // 4
+        codes = chars.view(np.uint32).reshape(len(chars), width).astype(np.int64)
+
+        gram_chunks = []
+        position_chunks = []
+        for n in range(1, MAX_NGRAM + 1):
+            for start in range(width - n + 1):
+                positions = np.flatnonzero(codes[:, start + n - 1])
+                gram_codes = np.zeros(len(positions), dtype=np.int64)
+                for offset in range(n):
+                    gram_codes = gram_codes * CODE_BASE + codes[positions, start + offset]
+                gram_chunks.append(gram_codes)
+                position_chunks.append(positions.astype(np.int32))
+
+        gram_codes = np.concatenate(gram_chunks) if gram_chunks else np.empty(0, dtype=np.int64)
+        positions = np.concatenate(position_chunks) if position_chunks else np.empty(0, dtype=np.int32)
+
+        # Sort by (gram, position) and drop repeats of a gram within the same name
+        order = np.lexsort((positions, gram_codes))
+        gram_codes = gram_codes[order]
+        positions = positions[order]
+        keep = np.ones(len(gram_codes), dtype=bool)
+        keep[1:] = (gram_codes[1:] != gram_codes[:-1]) | (positions[1:] != positions[:-1])
+        gram_codes = gram_codes[keep]
+        self._postings = positions[keep]
+
+        # Each distinct gram owns a contiguous slice of the postings array
+        starts = np.flatnonzero(np.concatenate((gram_codes[:1] == gram_codes[:1], gram_codes[1:] != gram_codes[:-1])))
+        self._gram_codes = gram_codes[starts]
+        self._gram_starts = np.append(starts, len(gram_codes))
+
+    def _posting(self, gram):
+        gram_code = 0
+        for char in gram:
+            gram_code = gram_code * CODE_BASE + ord(char)
+        i = np.searchsorted(self._gram_codes, gram_code)
+        if i == len(self._gram_codes) or self._gram_codes[i] != gram_code:
+            return np.empty(0, dtype=np.int32)
+        return self._postings[self._gram_starts[i]:self._gram_starts[i + 1]]
+
+    def _verify(self, query, candidates):
+        # Confirm the full substring on a (small) candidate set
+        if len(candidates) == 0:
+            return candidates
+        matches = [query in name for name in self._names[candidates]]
+        return candidates[np.array(matches, dtype=bool)]
+
+    def _name_matches(self, query, within=None):
+        if within is not None:
+            return self._verify(query, within)
+        if len(query) <= MAX_NGRAM:
+            return self._posting(query)
+
+        # Intersect trigram postings, rarest first, then check the full query
+        postings = sorted(
+            (self._posting(query[i:i + MAX_NGRAM]) for i in range(len(query) - MAX_NGRAM + 1)),
+            key=len
+        )
+        candidates = postings[0]
+        for posting in postings[1:]:
+            if len(candidates) == 0:
+                break
+            candidates = np.intersect1d(candidates, posting, assume_unique=True)
+        return self._verify(query, candidates)
+
+    def _id_matches(self, query):
+        if not query.isdigit():
+            return np.empty(0, dtype=np.int32)
+        upper = query[:-1] + chr(ord(query[-1]) + 1)
+        lo = np.searchsorted(self._sorted_ids, query, side='left')
+        hi = np.searchsorted(self._sorted_ids, upper, side='left')
+        return np.sort(self._id_order[lo:hi]).astype(np.int32)
+
+    def search(self, query, previous=None):
+        """Return roster row positions whose name contains the query or whose ID starts with it.
+
+        ``previous`` is an earlier ``(query, positions)`` result; when the new query extends it,
+        only those positions are re-checked instead of going back to the index.
+        """
+        query = query.strip().lower()
+        if not query:
+            return np.arange(self.size, dtype=np.int32)
+
+        within = None
+        if previous is not None and len(previous[1]) <= NARROW_LIMIT:
+            previous_query = previous[0].strip().lower()
+            if previous_query and previous_query in query:
+                within = previous[1]
+        return np.union1d(self._name_matches(query, within), self._id_matches(query)).astype(np.int32)
@@ -0,0 +1,225 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+import data_loader
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Setting a directory turns the shared cache on; every server process on the host points at the same one
+SHARED_CACHE_DIR = os.environ.get('STUDENT_SHARED_CACHE_DIR')
+
+# Total size of the entries on disk (and so of the mapped memory), evicted least recently used first
+BUDGET_BYTES = int(float(os.environ.get('STUDENT_SHARED_CACHE_MB', 512)) * 1024 * 1024)
+
+# Entries older than this are recomputed
+TTL_SECONDS = float(os.environ.get('STUDENT_SHARED_CACHE_TTL', 3600))
+
+# Entries each process keeps open; their numeric columns stay backed by the mapped files
+PROCESS_ENTRIES = 32
+
+ENABLED = bool(SHARED_CACHE_DIR) and pa is not None
+
+
+def _string_dtype(arrow_type):
+    # Strings come back Arrow-backed, as the compact roster schema has them
+    if arrow_type in (pa.string(), pa.large_string()):
+        return pd.StringDtype('pyarrow')
+    return None
+
+
+def _write_frame(path, frame):
+    # Arrow needs plain string column labels; a categorical column index is restored on read
+    part = {'file': os.path.basename(path)}
+    if isinstance(frame.columns, pd.CategoricalIndex):
+        part['columns'] = {
+            'name': frame.columns.name,
+            'categories': [str(c) for c in frame.columns.categories],
+            'ordered': bool(frame.columns.ordered),
+        }
+        frame = frame.set_axis([str(c) for c in frame.columns], axis=1)
+    table = pa.Table.from_pandas(frame, preserve_index=True)
+    with pa.OSFile(path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return part
+
+
+def _read_frame(entry_dir, part):
+    # Memory-mapped: pages are shared with every other process reading the same file
+    source = pa.memory_map(os.path.join(entry_dir, part['file']))
+    frame = pa.ipc.open_file(source).read_all().to_pandas(split_blocks=True, types_mapper=_string_dtype)
+    columns = part.get('columns')
+    if columns is not None:
+        frame.columns = pd.CategoricalIndex(
+            list(frame.columns), categories=columns['categories'], ordered=columns['ordered'], name=columns['name']
+        )
+    return frame
+
+
+class SharedFrameCache:
+    """DataFrames (and dicts of them) shared between processes as memory-mapped Arrow files.
+
+    Each entry is a directory of Arrow IPC files written atomically. Reads refresh an entry's access
+    time, which drives least-recently-used eviction once the entries exceed the byte budget.
+    """
+
+    def __init__(self, directory, budget_bytes=BUDGET_BYTES, ttl_seconds=TTL_SECONDS,
+                 process_entries=PROCESS_ENTRIES):
+        self.directory = directory
+        self.budget_bytes = budget_bytes
+        self.ttl_seconds = ttl_seconds
+        self.process_entries = process_entries
+        self._open = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _entry_dir(self, key):
+        return os.path.join(self.directory, hashlib.sha1(repr(key).encode()).hexdigest())
+
+    def _expired(self, entry_dir):
+        return time.time() - os.stat(os.path.join(entry_dir, 'manifest.json')).st_mtime > self.ttl_seconds
+
+    def get(self, key):
+        """The cached value, or None when it is missing or expired."""
+        entry_dir = self._entry_dir(key)
+        try:
+            if self._expired(entry_dir):
+                self._remove(entry_dir)
+                return None
+            with self._lock:
+                if entry_dir in self._open:
+                    self._open.move_to_end(entry_dir)
+                    value = self._open[entry_dir]
+                else:
+                    value = None
+            if value is None:
+                value = self._read(entry_dir)
+                self._remember(entry_dir, value)
+            # The directory's access time is the LRU clock shared by all processes
+            os.utime(entry_dir)
+            return value
+        except (OSError, ValueError, KeyError):
+            # Missing, evicted by another process, or half removed
+            return None
+
+    def _read(self, entry_dir):
+        with open(os.path.join(entry_dir, 'manifest.json')) as f:
+            manifest = json.load(f)
+        parts = {name: _read_frame(entry_dir, part) for name, part in manifest['parts'].items()}
+        for name, series_name in manifest['series'].items():
+            parts[name] = parts[name].iloc[:, 0].rename(series_name)
+        if manifest['kind'] == 'dict':
+            return parts
+        return parts['value']
+
+    def _remember(self, entry_dir, value):
+        with self._lock:
+            self._open[entry_dir] = value
+            self._open.move_to_end(entry_dir)
+            while len(self._open) > self.process_entries:
+                self._open.popitem(last=False)
+
+    def put(self, key, value):
+        """Publish a DataFrame, Series or dict of them; returns False for values that cannot be shared."""
+        parts = value if isinstance(value, dict) else {'value': value}
+        if not all(isinstance(part, (pd.DataFrame, pd.Series)) for part in parts.values()):
+            return False
+
+        entry_dir = self._entry_dir(key)
+        tmp_dir = tempfile.mkdtemp(dir=self.directory, prefix='.tmp-')
+        try:
+            manifest = {'kind': 'dict' if isinstance(value, dict) else 'value', 'parts': {}, 'series': {}}
+            for i, (name, part) in enumerate(parts.items()):
+                if isinstance(part, pd.Series):
+                    manifest['series'][name] = part.name
+                    part = part.to_frame(name='value')
+                manifest['parts'][name] = _write_frame(os.path.join(tmp_dir, f"part-{i}.arrow"), part)
+            with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as f:
+                json.dump(manifest, f)
+
+            self._evict(_dir_size(tmp_dir))
+            if os.path.isdir(entry_dir):
+                self._remove(entry_dir)
+            os.replace(tmp_dir, entry_dir)
+        except (OSError, TypeError, ValueError, pa.ArrowException):
+            # Another process published it first, or the value has types Arrow cannot hold
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return False
+        return True
+
+    def _evict(self, incoming_bytes):
+        # Oldest access first until the new entry fits in the budget
+        entries = []
+        for name in os.listdir(self.directory):
+            entry_dir = os.path.join(self.directory, name)
+            if name.startswith('.') or not os.path.isdir(entry_dir):
+                continue
+            try:
+                entries.append((os.stat(entry_dir).st_atime, _dir_size(entry_dir), entry_dir))
+            except OSError:
+                continue
+        total = sum(size for _, size, _ in entries) + incoming_bytes
+        for _, size, entry_dir in sorted(entries):
+            if total <= self.budget_bytes:
+                break
+            self._remove(entry_dir)
+            total -= size
+
+    def _remove(self, entry_dir):
+        # Processes that still map the files keep reading them; the space is freed once they let go
+        with self._lock:
+            self._open.pop(entry_dir, None)
+        shutil.rmtree(entry_dir, ignore_errors=True)
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            self._remove(os.path.join(self.directory, name))
+
+
+def _dir_size(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+@functools.lru_cache(maxsize=None)
+def default_cache():
+    return SharedFrameCache(SHARED_CACHE_DIR or os.path.join(data_loader.CACHE_DIR, 'shared'))
+
+
+def shared(func):
+    """Cache a loader's result in the shared store, keyed by its name and arguments (like st.cache_data).
+
+    Arguments whose name starts with an underscore are left out of the key. The returned frames are
+    shared within the process, so callers must not modify them.
+    """
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def call(*args, **kwargs):
+        arguments = signature.bind(*args, **kwargs)
+        arguments.apply_defaults()
+        key = (func.__module__, func.__qualname__) + tuple(
+            (name, value) for name, value in arguments.arguments.items() if not name.startswith('_')
+        )
+        cache = default_cache()
+        value = cache.get(key)
+        if value is None:
+            value = func(*args, **kwargs)
+            cache.put(key, value)
+        return value
+
+    # Entries of all loaders live together, so clearing one clears the whole store
+    call.clear = lambda: default_cache().clear()
+    return call
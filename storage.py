@@ -0,0 +1,458 @@
+"""Embedded SQLite storage for the roster and score sheets, imported from the Excel workbook.
+
+    python -m storage [--workbook StudentData.xlsx] [--database .data_cache/StudentData.sqlite]
+
+Aggregates, search, rankings and per-student lookups run as SQL queries, so only the
+reduced results are ever held in memory.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+import analytics
+import data_loader
+import registry
+
+# "excel" loads the workbook into memory; "sqlite" serves the dashboard from the database
+BACKEND = os.environ.get('STUDENT_DATA_BACKEND', 'excel').lower()
+DATABASE_PATH = os.environ.get('STUDENT_DATA_DB')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS scores (
+    student_id INTEGER NOT NULL,
+    test TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    score REAL,
+    percent REAL
+);
+CREATE INDEX IF NOT EXISTS scores_by_test ON scores (test, student_id);
+CREATE INDEX IF NOT EXISTS scores_by_student ON scores (student_id);
+
+-- Rollups maintained per test on import, so the aggregates never rescan every score
+CREATE TABLE IF NOT EXISTS test_cells (
+    test TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    score_sum REAL,
+    percent_sum REAL,
+    n INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS student_tests (
+    test TEXT NOT NULL,
+    student_id INTEGER NOT NULL,
+    percent_sum REAL,
+    n INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS student_tests_by_test ON student_tests (test, student_id);
+"""
+
+# Roster rows in import order; the first row wins if an ID repeats
+ROSTER_CTE = """
+roster AS (
+    SELECT "Student ID" AS student_id, "Name" AS name FROM students
+    WHERE position IN (SELECT MIN(position) FROM students GROUP BY "Student ID")
+)
+"""
+
+
+def database_path(workbook_path=data_loader.WORKBOOK_PATH):
+    if DATABASE_PATH:
+        return DATABASE_PATH
+    stem = os.path.splitext(os.path.basename(workbook_path))[0]
+    return os.path.join(data_loader.CACHE_DIR, f"{stem}.sqlite")
+
+
+def _sheet_digest(sheet):
+    return hashlib.sha1(pd.util.hash_pandas_object(sheet, index=False).to_numpy().tobytes()).hexdigest()
+
+
+def _sql_type(column):
+    if pd.api.types.is_integer_dtype(column.dtype):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(column.dtype):
+        return 'REAL'
+    return 'TEXT'
+
+
+def _sql_values(column):
+    # Plain Python values; missing ones become NULL
+    return column.astype(object).where(column.notna(), None).tolist()
+
+
+def _escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+class SQLiteStore:
+    """Roster and long-format scores in a SQLite file, queried instead of loaded.
+
+    sync() imports into a working database and then copies it to a read-only file per data version.
+    ``at(version)`` queries such a copy, so a later sync never changes what a reader of an earlier
+    version sees; the last ``keep`` copies are kept. Each copy also records the test registry it was
+    imported with (see registry.load_registry), which ``tests`` then holds.
+    """
+
+    def __init__(self, path, tests=analytics.TESTS, keep=data_loader.KEEP_VERSIONS, read_only=False):
+        self.path = path
+        self.keep = keep
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        self._use_tests(tests)
+        if read_only:
+            con = self._connect()
+            try:
+                stored = self._meta(con).get('tests')
+            finally:
+                con.close()
+            if stored:
+                self._use_tests(json.loads(stored))
+            return
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as con:
+            con.execute('PRAGMA journal_mode=WAL')
+            con.executescript(SCHEMA)
+
+    def _connect(self):
+        # A short-lived connection per call, so sessions on different threads never share one
+        if self.read_only:
+            # Never creates the file, so a pruned version fails instead of reading as empty
+            return sqlite3.connect(f"file:{quote(os.path.abspath(self.path))}?mode=ro", uri=True, timeout=30)
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _use_tests(self, tests):
+        self.tests = tests
+        self.test_max_scores = registry.test_max_scores(tests)
+        self.test_names = list(self.test_max_scores)
+        self.subject_cols = registry.subject_columns(tests)
+        self.test_subjects = registry.test_subjects(tests)
+
+    def version_path(self, version):
+        return f"{self.path}.{version[:16]}"
+
+    def at(self, version):
+        """A read-only store with the data of a version returned by sync(), while it is one of the last ``keep``."""
+        path = self.version_path(version)
+        if not os.path.exists(path):
+            raise KeyError(f"Data version {version[:12]} is no longer stored")
+        return SQLiteStore(path, self.tests, read_only=True)
+
+    def _write_version(self, con, version):
+        # Copied with the backup API, so the snapshot is consistent even while other connections read
+        path = self.version_path(version)
+        if os.path.exists(path):
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+        os.close(fd)
+        copy = sqlite3.connect(tmp_path)
+        try:
+            con.backup(copy)
+            # A plain rollback journal: read-only connections then need no -wal/-shm files
+            copy.execute('PRAGMA journal_mode=DELETE')
+        finally:
+            copy.close()
+        os.replace(tmp_path, path)
+
+        # Older versions' copies go, newest first by modification time
+        pattern = re.compile(re.escape(os.path.basename(self.path)) + r'\.[0-9a-f]{16}$')
+        directory = os.path.dirname(os.path.abspath(path))
+        copies = sorted(
+            (entry for entry in os.scandir(directory) if pattern.match(entry.name)),
+            key=lambda entry: entry.stat().st_mtime_ns, reverse=True
+        )
+        for entry in copies[self.keep:]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def _query(self, sql, params=()):
+        con = self._connect()
+        try:
+            return pd.read_sql_query(sql, con, params=params)
+        finally:
+            con.close()
+
+    def _meta(self, con):
+        return dict(con.execute('SELECT key, value FROM meta').fetchall())
+
+    def _import_roster(self, con, roster):
+        # Plain statements rather than DataFrame.to_sql, which commits the connection itself and
+        # would end sync's transaction halfway through the import
+        con.execute('DROP TABLE IF EXISTS students')
+        rows = roster.reset_index(drop=True)
+        rows.insert(0, 'position', np.arange(len(rows)))
+        # Lower-cased names for case-insensitive substring search
+        rows['name_key'] = rows['Name'].fillna('').astype(str).str.lower()
+        columns = ', '.join(f'"{col}" {_sql_type(rows[col])}' for col in rows.columns)
+        con.execute(f'CREATE TABLE students ({columns})')
+        con.executemany(
+            f'INSERT INTO students VALUES ({", ".join("?" * len(rows.columns))})',
+            zip(*(_sql_values(rows[col]) for col in rows.columns))
+        )
+        con.execute('CREATE INDEX students_by_id ON students ("Student ID")')
+
+    def _import_test(self, con, test_name, sheet):
+        for table in ('scores', 'test_cells', 'student_tests'):
+            con.execute(f'DELETE FROM {table} WHERE test = ?', (test_name,))
+        if sheet is None:
+            return
+        facts = analytics.build_score_facts({test_name: sheet}, {test_name: self.test_max_scores[test_name]},
+                                            self.subject_cols, self.test_subjects)
+        con.executemany(
+            'INSERT INTO scores (student_id, test, subject, score, percent) VALUES (?, ?, ?, ?, ?)',
+            zip(
+                facts['Student ID'].tolist(),
+                facts['Test'].astype(str).tolist(),
+                facts['Subject'].astype(str).tolist(),
+                # NaN is stored as NULL, which AVG skips just like pandas' mean
+                facts['Score'].astype('float64').tolist(),
+                facts['Percent'].astype('float64').tolist()
+            )
+        )
+        con.execute(
+            'INSERT INTO test_cells SELECT test, subject, SUM(score), SUM(percent), COUNT(score) '
+            'FROM scores WHERE test = ? GROUP BY subject',
+            (test_name,)
+        )
+        con.execute(
+            'INSERT INTO student_tests SELECT test, student_id, SUM(percent), COUNT(percent) '
+            'FROM scores WHERE test = ? GROUP BY student_id',
+            (test_name,)
+        )
+
+    def sync(self, workbook_path=data_loader.WORKBOOK_PATH):
+        """Import the sheets that changed since the last sync and return the data version."""
+        source_version = data_loader.workbook_version(workbook_path)
+        with self._lock:
+            con = self._connect()
+            try:
+                meta = self._meta(con)
+                if meta.get('source_version') == source_version and meta.get('version'):
+                    self._write_version(con, meta['version'])
+                    return meta['version']
+
+                sheets = data_loader.load_workbook(workbook_path)
+                # The registry is read with the workbook, so a test added to its Tests sheet is imported
+                # by this sync; a changed registry (max scores, subjects) re-imports every test
+                previous_tests = json.loads(meta.get('tests', '[]'))
+                self._use_tests(registry.load_registry(workbook_path))
+                tests_changed = previous_tests != self.tests
+                sheet_names = [data_loader.STUDENT_INFO_SHEET] + self.test_names
+                digests = {
+                    name: _sheet_digest(sheets[name]) if name in sheets else ''
+                    for name in sheet_names
+                }
+
+                # One transaction: readers see either the old data or the new, never a mix. It is
+                # opened explicitly, as sqlite3 would otherwise run the DROP/CREATE statements outside it
+                with con:
+                    con.execute('BEGIN IMMEDIATE')
+                    for test in previous_tests:
+                        if test['name'] not in self.test_max_scores:
+                            self._import_test(con, test['name'], None)
+                            con.execute('DELETE FROM meta WHERE key = ?', (f"sheet:{test['name']}",))
+                    for name in sheet_names:
+                        unchanged = meta.get(f'sheet:{name}') == digests[name] and 'version' in meta
+                        if unchanged and (name == data_loader.STUDENT_INFO_SHEET or not tests_changed):
+                            continue
+                        if name == data_loader.STUDENT_INFO_SHEET:
+                            self._import_roster(con, sheets[name])
+                        else:
+                            self._import_test(con, name, sheets.get(name))
+
+                    tests_json = json.dumps(self.tests)
+                    version = hashlib.sha256(
+                        '\n'.join([f"{name}:{digests[name]}" for name in sheet_names] + [tests_json]).encode()
+                    ).hexdigest()
+                    roster_columns = [str(col) for col in sheets[data_loader.STUDENT_INFO_SHEET].columns]
+                    updates = {f'sheet:{name}': digest for name, digest in digests.items()}
+                    updates.update({
+                        'source_version': source_version,
+                        'version': version,
+                        'columns': json.dumps(roster_columns),
+                        'tests': tests_json,
+                    })
+                    con.executemany('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', updates.items())
+                self._write_version(con, version)
+                return version
+            finally:
+                con.close()
+
+    def _roster_columns(self):
+        con = self._connect()
+        try:
+            return json.loads(self._meta(con).get('columns', '[]'))
+        finally:
+            con.close()
+
+    def roster(self, columns=None):
+        """The roster in import order, optionally only some of its columns."""
+        columns = columns or self._roster_columns()
+        select = ', '.join(f'"{col}"' for col in columns)
+        return data_loader.compact_roster(self._query(f'SELECT {select} FROM students ORDER BY position'))
+
+    def facts(self):
+        """The long-format fact table, in the same shape as analytics.build_score_facts."""
+        return self._facts_frame(self._query(
+            'SELECT student_id AS "Student ID", test AS "Test", subject AS "Subject", '
+            'score AS "Score", percent AS "Percent" FROM scores'
+        ))
+
+    def _facts_frame(self, frame):
+        # Same categorical labels as the in-memory fact table, so analytics reshapes it identically
+        if 'Test' in frame:
+            frame['Test'] = pd.Categorical(frame['Test'], categories=self.test_names, ordered=True)
+        if 'Subject' in frame:
+            frame['Subject'] = pd.Categorical(frame['Subject'], categories=self.subject_cols)
+        return frame
+
+    def aggregates(self):
+        """The dashboard aggregates, reduced in SQL and reshaped by analytics."""
+        # A zero count divides to NULL, i.e. a missing average
+        test = self._facts_frame(self._query(
+            'SELECT test AS "Test", SUM(score_sum) / SUM(n) AS "Score", SUM(percent_sum) / SUM(n) AS "Percent" '
+            'FROM test_cells GROUP BY test'
+        ))
+        test_subject = self._facts_frame(self._query(
+            'SELECT test AS "Test", subject AS "Subject", score_sum / n AS "Score", percent_sum / n AS "Percent" '
+            'FROM test_cells'
+        ))
+        student_test = self._facts_frame(self._query(
+            'SELECT student_id AS "Student ID", test AS "Test", percent_sum / n AS "Percent" FROM student_tests'
+        ))
+        # A full scan with a temporary B-tree beats walking the per-test index here
+        student_subject = self._facts_frame(self._query(
+            'SELECT student_id AS "Student ID", subject AS "Subject", AVG(percent) AS "Percent" '
+            'FROM scores NOT INDEXED GROUP BY student_id, subject'
+        ))
+
+        # Each grouped row is already the mean of its cell, so the analytics reshapes leave it as is
+        return analytics.assemble_aggregates(
+            analytics.test_averages(test),
+            analytics.test_subject_averages(test_subject),
+            analytics.student_test_percent(student_test),
+            analytics.student_subject_percent(student_subject),
+            self.roster(['Student ID', 'Name'])
+        )
+
+    def __len__(self):
+        con = self._connect()
+        try:
+            return con.execute('SELECT COUNT(DISTINCT "Student ID") FROM students').fetchone()[0]
+        finally:
+            con.close()
+
+    def __contains__(self, student_id):
+        return self.get(student_id) is not None
+
+    def search(self, query, previous=None):
+        """Roster positions whose name contains the query or whose ID starts with it (see StudentSearchIndex)."""
+        query = query.strip().lower()
+        if not query:
+            sql, params = 'SELECT position FROM students ORDER BY position', ()
+        else:
+            sql = "SELECT position FROM students WHERE name_key LIKE ? ESCAPE '\\'"
+            params = (f"%{_escape_like(query)}%",)
+            if query.isdigit():
+                sql += ' OR CAST("Student ID" AS TEXT) LIKE ?'
+                params += (f"{query}%",)
+            sql += ' ORDER BY position'
+
+        con = self._connect()
+        try:
+            positions = [row[0] for row in con.execute(sql, params)]
+        finally:
+            con.close()
+        return np.array(positions, dtype=np.int32)
+
+    def get(self, student_id):
+        """Roster details of a student as a dict, or None for an unknown ID."""
+        columns = self._roster_columns()
+        select = ', '.join(f'"{col}"' for col in columns)
+        con = self._connect()
+        try:
+            row = con.execute(
+                f'SELECT {select} FROM students WHERE "Student ID" = ? ORDER BY position LIMIT 1', (int(student_id),)
+            ).fetchone()
+        finally:
+            con.close()
+        return None if row is None else dict(zip(columns, row))
+
+    def scores(self, student_id):
+        """Raw scores of a student, one row per test and one column per subject."""
+        if student_id not in self:
+            return None
+        con = self._connect()
+        try:
+            rows = con.execute('SELECT test, subject, score FROM scores WHERE student_id = ?',
+                               (int(student_id),)).fetchall()
+        finally:
+            con.close()
+
+        card = np.full((len(self.test_names), len(self.subject_cols)), np.nan, dtype=np.float32)
+        if rows:
+            tests, subjects, values = zip(*rows)
+            test_pos = pd.Index(self.test_names).get_indexer(tests)
+            subject_pos = pd.Index(self.subject_cols).get_indexer(subjects)
+            known = (test_pos >= 0) & (subject_pos >= 0)
+            card[test_pos[known], subject_pos[known]] = np.array(values, dtype=np.float32)[known]
+        return pd.DataFrame(card, index=self.test_names, columns=self.subject_cols)
+
+    def report_card(self, student_id):
+        """Scores for every test together with the maximum score and the percentage obtained."""
+        card = self.scores(student_id)
+        if card is None:
+            return None
+        card["Max Score"] = np.array([self.test_max_scores[name] for name in self.test_names], dtype=np.float32)
+        card["Percent"] = card[self.subject_cols].mean(axis=1) / card["Max Score"] * 100
+        card.index.name = "Test"
+        return card
+
+    def rank_students(self, scope="overall", name=None, k=5, largest=True):
+        """Top-k (or bottom-k) students as in analytics.rank_students, selected by the database."""
+        if scope == "overall":
+            ranked = 'SELECT student_id, AVG(percent_sum / n) AS pct FROM student_tests GROUP BY student_id'
+            params = ()
+        elif scope == "test":
+            ranked = 'SELECT student_id, percent_sum / n AS pct FROM student_tests WHERE test = ?'
+            params = (name,)
+        elif scope == "subject":
+            ranked = 'SELECT student_id, AVG(percent) AS pct FROM scores WHERE subject = ? GROUP BY student_id'
+            params = (name,)
+        else:
+            raise ValueError(f"Unknown ranking scope: {scope}")
+
+        order = 'DESC' if largest else 'ASC'
+        return self._query(
+            f'WITH {ROSTER_CTE}, ranked AS ({ranked}) '
+            'SELECT roster.student_id AS "Student ID", roster.name AS "Name", ranked.pct AS "Score (%)" '
+            'FROM ranked JOIN roster USING (student_id) WHERE ranked.pct IS NOT NULL '
+            f'ORDER BY ranked.pct {order}, roster.student_id LIMIT ?',
+            params + (max(int(k), 0),)
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import the student workbook into the SQLite database.")
+    parser.add_argument('--workbook', default=data_loader.WORKBOOK_PATH)
+    parser.add_argument('--database')
+    args = parser.parse_args()
+
+    store = SQLiteStore(args.database or database_path(args.workbook))
+    version = store.sync(args.workbook)
+    print(f"{store.path}: {len(store)} students, version {version[:12]}")
+
+
+if __name__ == '__main__':
+    main()